@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the redaction code in filtered_logger
+
+    ./benchmark.py
+"""
+import logging
+import random
+import string
+import timeit
+from typing import List, Tuple
+
+from filtered_logger import (PII_FIELDS, RedactingFormatter, filter_datum,
+                             filter_datum_bulk)
+
+
+def make_fields(count: int) -> List[str]:
+    """ returns count distinct field names """
+    return ["field{}".format(i) for i in range(count)]
+
+
+def make_pairs(fields: List[str], size: int) -> List[Tuple[str, str]]:
+    """ returns random key=value pairs totalling about size characters """
+    rand = random.Random(0)
+    keys = fields + ["other{}".format(i) for i in range(len(fields) // 10)]
+    pairs, length = [], 0
+    while length < size:
+        key = rand.choice(keys)
+        pairs.append((key, "".join(rand.choices(string.ascii_letters, k=12))))
+        length += len(key) + 14
+    return pairs
+
+
+class ReplaceFormatter(RedactingFormatter):
+    """ The previous per-field str.replace formatter, for comparison """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """format function"""
+        message = logging.Formatter.format(self, record)
+        for field in self.fields:
+            message = message.replace(
+                f"{field}={getattr(record, field)}",
+                f"{field}={self.REDACTION}"
+            )
+        return message
+
+
+def bench_formatter(n_fields: int = 1000, size: int = 10 * 1024,
+                    number: int = 20) -> None:
+    """ RedactingFormatter.format against the str.replace loop """
+    fields = make_fields(n_fields)
+    pairs = make_pairs(fields, size)
+    line = "".join("{}={};".format(k, v) for k, v in pairs)
+    extra = dict.fromkeys(fields, "")
+    extra.update(pairs)
+    record = logging.makeLogRecord(
+        dict(extra, name="bench", levelno=logging.INFO, levelname="INFO",
+             msg=line))
+
+    formatters = [("str.replace", ReplaceFormatter(fields)),
+                  ("single pass", RedactingFormatter(fields)),
+                  ("redact_record", RedactingFormatter(fields, True))]
+    print("RedactingFormatter.format, {} fields, {} KB line".format(
+        n_fields, len(line) // 1024))
+    for name, formatter in formatters:
+        seconds = timeit.timeit(lambda: formatter.format(record),
+                                number=number) / number
+        print("  {:<14} {:8.3f} ms/line".format(name, seconds * 1e3))
+
+
+def bench_bulk(count: int = 200000, number: int = 3) -> None:
+    """ filter_datum_bulk against a filter_datum loop """
+    fields = list(PII_FIELDS)
+    messages = ["name=bob{0};email=bob{0}@dylan.com;phone=555{0};"
+                "ssn={0};password=bobbycool;ip=10.0.0.1;".format(i)
+                for i in range(count)]
+    assert filter_datum_bulk(fields, "***", messages, ";") == \
+        [filter_datum(fields, "***", m, ";") for m in messages]
+
+    runs = [("filter_datum loop",
+             lambda: [filter_datum(fields, "***", m, ";") for m in messages]),
+            ("filter_datum_bulk",
+             lambda: filter_datum_bulk(fields, "***", messages, ";"))]
+    print("filter_datum over {} messages".format(count))
+    for name, run in runs:
+        seconds = timeit.timeit(run, number=number) / number
+        print("  {:<18} {:8.1f} ms ({:.0f} rows/s)".format(
+            name, seconds * 1e3, count / seconds))
+
+
+if __name__ == "__main__":
+    bench_formatter()
+    bench_bulk()
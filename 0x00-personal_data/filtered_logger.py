@@ -39,16 +39,86 @@ def filter_datum(fields: List, redaction: str,
     return regex.sub(fr"\1={redaction}", message)
 """
 import re
+import atexit
 import logging
-from typing import List
+import queue
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Iterable, List, Tuple
+
+
+ENGINE_CACHE_SIZE = 128
+PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+QUEUE_SIZE = 10000
+BATCH_SENTINEL = "\x1e\x00"
+
+
+class RedactionEngine:
+    """Compiled redaction pattern for one (fields, separator, redaction)"""
+
+    def __init__(self, fields: Tuple[str, ...], separator: str,
+                 redaction: str):
+        """init function: compile the pattern once"""
+        self.fields = tuple(fields)
+        self.separator = separator
+        self.redaction = redaction
+        self.pattern = re.compile(
+            fr'({"|".join(self.fields)})=[^{separator}]+')
+        self.replacement = fr'\1={redaction}'
+
+    def redact(self, message: str) -> str:
+        """ returns the log message obfuscated """
+        return self.pattern.sub(self.replacement, message)
+
+    def redact_many(self, messages: Iterable[str]) -> List[str]:
+        """ returns every log message of messages obfuscated """
+        sub, replacement = self.pattern.sub, self.replacement
+        return [sub(replacement, message) for message in messages]
+
+    def redact_batch(self, messages: Iterable[str]) -> List[str]:
+        """ returns every log message of messages obfuscated
+
+        The messages are joined with a sentinel starting with the
+        separator, so no value runs into the next message, and redacted
+        with a single sub. Falls back to redact_many if a message holds
+        the sentinel itself.
+        """
+        if hasattr(messages, "tolist"):
+            messages = messages.tolist()
+        elif not isinstance(messages, list):
+            messages = list(messages)
+        if not messages or not self.separator:
+            return self.redact_many(messages)
+        sentinel = self.separator[0] + BATCH_SENTINEL
+        redacted = self.redact(sentinel.join(messages)).split(sentinel)
+        if len(redacted) != len(messages):
+            return self.redact_many(messages)
+        return redacted
+
+
+@lru_cache(maxsize=ENGINE_CACHE_SIZE)
+def get_redaction_engine(fields: Tuple[str, ...], separator: str,
+                         redaction: str) -> RedactionEngine:
+    """ returns the cached RedactionEngine for the given key """
+    return RedactionEngine(fields, separator, redaction)
 
 
 # def filter_datum(fields, redaction, message, separator):
 def filter_datum(fields: List[str], redaction: str,
                  message: str, separator: str) -> str:
     """ that returns the log message obfuscated """
-    return re.sub(fr'({"|".join(fields)})=[^{separator}]+',
-                  fr'\1={redaction}', message)
+    engine = get_redaction_engine(tuple(fields), separator, redaction)
+    return engine.redact(message)
+
+
+def filter_datum_bulk(fields: List[str], redaction: str,
+                      messages: Iterable[str], separator: str) -> List[str]:
+    """ returns the list of filter_datum results for messages
+
+    messages may be a list, any iterable of str or a NumPy string array.
+    """
+    engine = get_redaction_engine(tuple(fields), separator, redaction)
+    return engine.redact_batch(messages)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -56,18 +126,101 @@ class RedactingFormatter(logging.Formatter):
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
+    RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__)
 
-    def __init__(self, fields=None):
-        """init function"""
+    def __init__(self, fields=None, redact_record: bool = False):
+        """init function
+
+        With redact_record, the fields are redacted from the record (its
+        message and any matching `extra` attributes) before formatting
+        instead of from the formatted line.
+        """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields or []
+        self.redact_record = redact_record
+        self.engine = get_redaction_engine(tuple(self.fields),
+                                           self.SEPARATOR, self.REDACTION)
 
     def format(self, record: logging.LogRecord) -> str:
         """format function"""
+        if not self.fields:
+            return super(RedactingFormatter, self).format(record)
+        if self.redact_record:
+            return super(RedactingFormatter, self).format(
+                self.redacted_record(record))
         message = super(RedactingFormatter, self).format(record)
+        return self.engine.redact(message)
+
+    def redacted_record(self, record: logging.LogRecord) -> logging.LogRecord:
+        """returns a redacted copy of record, leaving record untouched"""
+        redacted = logging.makeLogRecord(record.__dict__)
+        redacted.msg = self.engine.redact(record.getMessage())
+        redacted.args = None
+        if record.exc_info and not record.exc_text:
+            redacted.exc_text = self.formatException(record.exc_info)
+        if redacted.exc_text:
+            redacted.exc_text = self.engine.redact(redacted.exc_text)
+        if redacted.stack_info:
+            redacted.stack_info = self.engine.redact(redacted.stack_info)
         for field in self.fields:
-            message = message.replace(
-                f"{field}={getattr(record, field)}",
-                f"{field}={self.REDACTION}"
-            )
-        return message
+            if field not in self.RECORD_ATTRIBUTES and hasattr(record, field):
+                setattr(redacted, field, self.REDACTION)
+        return redacted
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue that drops or blocks when full"""
+    POLICIES = ("block", "drop")
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "block"):
+        """init function"""
+        if policy not in self.POLICIES:
+            raise ValueError("policy must be one of {}".format(self.POLICIES))
+        super(BoundedQueueHandler, self).__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """enqueue function: waits for room or drops the record"""
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BlockingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        """enqueue_sentinel function"""
+        self.queue.put(self._sentinel)
+
+
+def get_logger(stream: IO = None, queue_size: int = QUEUE_SIZE,
+               policy: str = "block") -> logging.Logger:
+    """returns the "user_data" logger
+
+    Records go through a bounded queue to a background listener thread
+    which redacts PII_FIELDS and writes to stream (stderr by default), so
+    a slow sink never blocks the caller beyond policy. The listener is
+    stopped, and the queue flushed, at exit.
+    """
+    logger = logging.getLogger("user_data")
+    if logger.handlers:
+        return logger
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(RedactingFormatter(list(PII_FIELDS)))
+    log_queue = queue.Queue(queue_size)
+    listener = BlockingQueueListener(log_queue, stream_handler,
+                                     respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(BoundedQueueHandler(log_queue, policy))
+    return logger
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Redact historical log files with the filter_datum rules
+
+    ./redact_logs.py [-f name,email] [-w 8] app.log.gz app.redacted.log.gz
+
+The input is streamed in large line-aligned chunks; with --workers the
+chunks are redacted by a process pool and written back in order. Files
+ending in .gz are read/written through gzip, "-" means stdin/stdout.
+Throughput is reported on stderr.
+"""
+import argparse
+import gzip
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, Tuple
+
+from filtered_logger import PII_FIELDS, get_redaction_engine
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+ENCODING = "utf-8"
+
+
+def open_input(file_path: str) -> BinaryIO:
+    """ opens file_path for reading, through gzip if needed """
+    if file_path == "-":
+        return sys.stdin.buffer
+    with open(file_path, "rb") as f:
+        is_gzip = f.read(2) == b"\x1f\x8b"
+    if is_gzip:
+        return gzip.open(file_path, "rb")
+    return open(file_path, "rb")
+
+
+def open_output(file_path: str) -> BinaryIO:
+    """ opens file_path for writing, through gzip if it ends in .gz """
+    if file_path == "-":
+        return sys.stdout.buffer
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "wb", compresslevel=6)
+    return open(file_path, "wb")
+
+
+def read_chunks(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """ yields chunks of about chunk_size bytes ending on a line break """
+    rest = b""
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            rest += data
+            continue
+        yield rest + data[:end]
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def redact_chunk(key: Tuple[Tuple[str, ...], str, str],
+                 data: bytes) -> bytes:
+    """ returns the redacted chunk data """
+    engine = get_redaction_engine(*key)
+    text = data.decode(ENCODING, "surrogateescape")
+    return engine.redact(text).encode(ENCODING, "surrogateescape")
+
+
+def redact_stream(src: BinaryIO, dst: BinaryIO,
+                  key: Tuple[Tuple[str, ...], str, str],
+                  workers: int = 0, chunk_size: int = CHUNK_SIZE) -> int:
+    """ redacts src into dst and returns the number of bytes read """
+    total = 0
+    if workers < 2:
+        for chunk in read_chunks(src, chunk_size):
+            total += len(chunk)
+            dst.write(redact_chunk(key, chunk))
+        return total
+
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for chunk in read_chunks(src, chunk_size):
+            total += len(chunk)
+            pending.append(executor.submit(redact_chunk, key, chunk))
+            if len(pending) >= 2 * workers:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+    return total
+
+
+def main() -> None:
+    """ command line entry point """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="log file to redact, - for stdin")
+    parser.add_argument("output", help="redacted log file, - for stdout")
+    parser.add_argument("-f", "--fields", default=",".join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    parser.add_argument("-s", "--separator", default=";")
+    parser.add_argument("-r", "--redaction", default="***")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="redact chunks in this many processes")
+    parser.add_argument("-c", "--chunk-size", type=int,
+                        default=CHUNK_SIZE // (1024 * 1024),
+                        help="chunk size in MB")
+    args = parser.parse_args()
+
+    # The line break is added to the separator so a value never runs
+    # past the end of its line, as with filter_datum on a single line.
+    key = (tuple(args.fields.split(",")), args.separator + "\n",
+           args.redaction)
+    start = time.perf_counter()
+    src, dst = open_input(args.input), open_output(args.output)
+    try:
+        total = redact_stream(src, dst, key, args.workers,
+                              args.chunk_size * 1024 * 1024)
+    finally:
+        if dst is not sys.stdout.buffer:
+            dst.close()
+        if src is not sys.stdin.buffer:
+            src.close()
+    elapsed = time.perf_counter() - start
+    print("{} bytes in {:.2f}s ({:.1f} MB/s)".format(
+        total, elapsed, total / (elapsed or 1) / 1e6), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
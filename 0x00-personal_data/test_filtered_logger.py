@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests of filtered_logger
+"""
+import io
+import logging
+import sys
+
+import pytest
+
+from filtered_logger import RedactingFormatter
+
+
+@pytest.fixture(params=[False, True], ids=["line", "record"])
+def logged(request):
+    """(logger, stream) of a logger redacting password either way"""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(RedactingFormatter(["password"],
+                                            redact_record=request.param))
+    logger = logging.getLogger("test_filtered_logger")
+    logger.propagate = False
+    logger.addHandler(handler)
+    yield logger, stream
+    logger.removeHandler(handler)
+
+
+def test_exception_redacted(logged):
+    """The traceback of a logged exception is redacted too"""
+    logger, stream = logged
+    try:
+        raise ValueError("bad login: password=hunter2;")
+    except ValueError:
+        logger.exception("login failed for password=hunter2;")
+    output = stream.getvalue()
+    assert "hunter2" not in output
+    assert "ValueError: bad login: password=***;" in output
+
+
+def test_stack_info_redacted(logged):
+    """The stack info of a record is redacted too"""
+    logger, stream = logged
+    logger.error("password=hunter2;", stack_info=True)
+    output = stream.getvalue()
+    assert "hunter2" not in output
+    assert "Stack (most recent call last)" in output
+
+
+def test_record_untouched():
+    """redact_record leaves the record to the other handlers as it was"""
+    formatter = RedactingFormatter(["password"], redact_record=True)
+    try:
+        raise ValueError("password=hunter2;")
+    except ValueError:
+        record = logging.makeLogRecord({
+            "msg": "password=%s;", "args": ("hunter2",),
+            "exc_info": sys.exc_info()})
+    assert "hunter2" not in formatter.format(record)
+    assert record.getMessage() == "password=hunter2;"
+    assert record.exc_text is None
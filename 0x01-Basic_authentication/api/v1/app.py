@@ -3,9 +3,11 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.auth import PathMatcher
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.hashers import Overloaded
 import os
 
 
@@ -13,6 +15,9 @@ app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+excluded_paths = PathMatcher(['/api/v1/status/',
+                              '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/'])
 
 if os.getenv('AUTH_TYPE') == 'auth':
     from api.v1.auth.auth import Auth
@@ -43,21 +48,27 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """ Too many passwords being hashed handler
+    """
+    response = jsonify({"error": "Service unavailable"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.before_request
 def check_auth_and_authorization():
     """ Check if auth is None
     """
     if auth is not None:
-        excluded_paths = ['/api/v1/status/',
-                          '/api/v1/unauthorized/',
-                          '/api/v1/forbidden/']
         if auth.require_auth(request.path, excluded_paths):
             auth_header = auth.authorization_header(request)
             if auth_header is None:
                 abort(401)
 
             current_user = auth.current_user(request)
-            if current_user:
+            if current_user is None:
                 abort(403)
 
 
@@ -2,18 +2,81 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+import json
+
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 100
+
+
+def iter_pages(cursor: str = None):
+    """ Yield the users after cursor in pages of STREAM_CHUNK_SIZE users
+    """
+    while True:
+        users, cursor = User.page(cursor, STREAM_CHUNK_SIZE)
+        yield users
+        if cursor is None:
+            return
+
+
+def stream_users(pages):
+    """ Yield a JSON array of the users of pages, one chunk per page
+    """
+    yield "["
+    separator = ""
+    for users in pages:
+        if users:
+            yield separator + ",".join(
+                json.dumps(user.to_json(), sort_keys=True) for user in users)
+            separator = ","
+    yield "]"
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size, up to MAX_PAGE_SIZE, in id order
+      - cursor: X-Next-Cursor of the previous page
+      - stream: if true, the JSON array is streamed in chunks, with
+        X-Next-Cursor as well when limit is given
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, or of one page with
+        the cursor of the next one in the X-Next-Cursor header
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    stream = request.args.get('stream', '').lower() in ('1', 'true')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    if stream and limit is None:
+        return Response(stream_users(iter_pages(cursor)),
+                        mimetype='application/json')
+    if limit is None and cursor is None:
+        all_users = [user.to_json() for user in User.all()]
+        return jsonify(all_users)
+    users, next_cursor = User.page(cursor, limit or MAX_PAGE_SIZE)
+    if stream:
+        # the page is taken before streaming, for its X-Next-Cursor
+        pages = (users[i:i + STREAM_CHUNK_SIZE]
+                 for i in range(0, len(users), STREAM_CHUNK_SIZE))
+        response = Response(stream_users(pages),
+                            mimetype='application/json')
+    else:
+        response = jsonify([user.to_json() for user in users])
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
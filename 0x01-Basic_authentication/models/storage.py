@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+""" Storage module: crash-safe files behind models.base
+"""
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from itertools import chain
+from os import path
+from typing import Callable, Iterable, Iterator, List, Tuple
+import json
+import mmap
+import os
+import re
+import threading
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def fsync_dir(file_path: str):
+    """ Flush the directory entry of file_path (rename/unlink) to disk
+    """
+    try:
+        fd = os.open(path.dirname(path.abspath(file_path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def dumps(obj) -> bytes:
+    """ Encode obj to JSON, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def loads(data: bytes):
+    """ Decode JSON data, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_snapshot(file_path: str) -> dict:
+    """ Decode the snapshot file_path, with orjson when it is installed
+    """
+    with open(file_path, 'rb') as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
+        return json.load(f)
+
+
+def write_snapshot(file_path: str, items: Iterable[Tuple[str, dict]]):
+    """ Write {id: object JSON} to file_path atomically: a temporary file
+    is written and fsynced, then renamed over file_path
+
+    Objects are encoded one at a time, one per line, so the whole store
+    is never held in memory as JSON. An object already encoded may be
+    given as bytes.
+    """
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'wb', buffering=1024 * 1024) as f:
+        separator = b"{\n"
+        for obj_id, obj_json in items:
+            if not isinstance(obj_json, bytes):
+                obj_json = dumps(obj_json)
+            f.write(separator + dumps(obj_id) + b": " + obj_json)
+            separator = b",\n"
+        f.write(b"{}\n" if separator == b"{\n" else b"\n}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    fsync_dir(file_path)
+
+
+def is_line_snapshot(file_path: str) -> bool:
+    """ True if file_path was written by write_snapshot, one object per
+    line, and so can be read by LazyStore
+    """
+    with open(file_path, 'rb') as f:
+        return f.read(2) in (b"{\n", b"{}")
+
+
+class LazyStore(MutableMapping):
+    """ id -> object mapping over a snapshot written by write_snapshot
+
+    The snapshot is mapped in memory and only an id -> (start, end) index
+    of its lines is built, on first use. Objects are decoded with factory
+    on access and kept in a cache of cache_size entries. Objects stored
+    with store[id] = obj are kept in memory until a snapshot including
+    them is written and remap() moves the store over it.
+    """
+    KEY = re.compile(rb'\n"([^"\\\n]*(?:\\.[^"\\\n]*)*)": ')
+    # a key and its scalar value; the lookbehind, checked only where the
+    # key is found, keeps the literal key first for a fast search
+    VALUE = (rb'"%s"(?<=[{,\s]"%s"):\s*'
+             rb'("[^"\\]*(?:\\.[^"\\]*)*"|[-+.\w]+)')
+
+    def __init__(self, file_path: str, factory: Callable[[dict], object],
+                 cache_size: int = 10000):
+        """ Initialize a LazyStore over file_path
+        """
+        self._mm = self._map(file_path)
+        self._factory = factory
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._spans = None
+        self._objs = {}
+        # ids removed from the snapshot, until a snapshot without them
+        self._removed = set()
+        # id -> change number of the ids in _objs or _removed
+        self._changes = {}
+        self._change = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _map(file_path: str):
+        """ Memory map of file_path
+        """
+        with open(file_path, 'rb') as f:
+            if path.getsize(file_path) == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def spans(self) -> dict:
+        """ id -> (start, end) of the objects only in the snapshot
+        """
+        with self._lock:
+            if self._spans is None:
+                spans, mm = {}, self._mm
+                skip = self._objs.keys() | self._removed
+                for match in self.KEY.finditer(mm):
+                    obj_id = match.group(1).decode()
+                    if "\\" in obj_id:
+                        obj_id = json.loads('"{}"'.format(obj_id))
+                    start = match.end()
+                    end = mm.find(b"\n", start)
+                    end = len(mm) if end < 0 else end
+                    if mm[end - 1] == ord(","):
+                        end -= 1
+                    if obj_id not in skip:
+                        spans[obj_id] = (start, end)
+                self._spans = spans
+            return self._spans
+
+    def __getitem__(self, obj_id: str):
+        """ Object of obj_id, decoded from the snapshot if needed
+        """
+        with self._lock:
+            obj = self._objs.get(obj_id)
+            if obj is not None:
+                return obj
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                self._cache.move_to_end(obj_id)
+                return obj
+            start, end = self.spans[obj_id]
+            obj = self._factory(loads(self._mm[start:end]))
+            self._cache_put(obj_id, obj)
+            return obj
+
+    def _cache_put(self, obj_id: str, obj):
+        """ Cache obj, evicting the least recently used objects
+        """
+        self._cache[obj_id] = obj
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _changed(self, obj_id: str):
+        """ Record a change of obj_id
+        """
+        self._change += 1
+        self._changes[obj_id] = self._change
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store obj in memory
+        """
+        with self._lock:
+            self.spans.pop(obj_id, None)
+            self._cache.pop(obj_id, None)
+            self._removed.discard(obj_id)
+            self._objs[obj_id] = obj
+            self._changed(obj_id)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove obj_id
+        """
+        with self._lock:
+            self._cache.pop(obj_id, None)
+            if self._objs.pop(obj_id, None) is None:
+                del self.spans[obj_id]
+            self._removed.add(obj_id)
+            self._changed(obj_id)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids, snapshot first
+        """
+        with self._lock:
+            ids = list(self.spans) + list(self._objs)
+        return iter(ids)
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        with self._lock:
+            return len(self.spans) + len(self._objs)
+
+    def __contains__(self, obj_id) -> bool:
+        """ True if obj_id is stored
+        """
+        with self._lock:
+            return obj_id in self._objs or obj_id in self.spans
+
+    def scan(self, key: str) -> Iterator[Tuple[str, object]]:
+        """ (id, value of key) of the objects having key, read from the
+        snapshot lines without decoding the objects, for indexing
+        """
+        with self._lock:
+            mm = self._mm
+            spans = list(self.spans.items())
+            objs = list(self._objs.items())
+        starts = [start for _, (start, _) in spans]
+        name = re.escape(key.encode())
+        pattern = re.compile(self.VALUE % (name, name))
+        for match in pattern.finditer(mm):
+            i = bisect_right(starts, match.start()) - 1
+            if i < 0 or match.end() > spans[i][1][1]:
+                continue
+            value = match.group(1)
+            if value[:1] == b'"' and b"\\" not in value:
+                yield spans[i][0], value[1:-1].decode()
+            else:
+                yield spans[i][0], loads(value)
+        for obj_id, obj in objs:
+            if hasattr(obj, key):
+                yield obj_id, getattr(obj, key)
+
+    def snapshot(self) -> Tuple[Iterator[Tuple[str, object]], int]:
+        """ (id, encoded JSON or object JSON) of the current objects, for
+        write_snapshot: lines of the snapshot are copied without decoding;
+        and the change number to give to remap() once it is written
+        """
+        with self._lock:
+            mm = self._mm
+            spans = list(self.spans.items())
+            objs = list(self._objs.items())
+            change = self._change
+        items = chain(((obj_id, mm[start:end]) for obj_id, (start, end)
+                       in spans),
+                      ((obj_id, obj.to_json(True)) for obj_id, obj in objs))
+        return items, change
+
+    def remap(self, file_path: str, change: int):
+        """ Move over file_path, a snapshot written from snapshot() when
+        at change: the objects it includes are no longer held in memory
+        but only cached, later changes are kept
+        """
+        mm = self._map(file_path)
+        with self._lock:
+            self._mm = mm
+            self._spans = None
+            for obj_id, obj_change in list(self._changes.items()):
+                if obj_change > change:
+                    continue
+                del self._changes[obj_id]
+                self._removed.discard(obj_id)
+                obj = self._objs.pop(obj_id, None)
+                if obj is not None:
+                    self._cache_put(obj_id, obj)
+
+
+class Journal():
+    """ Append-only JSON-lines journal of changes to a store
+
+    Each line is {"op": "save", "id": ..., "obj": {...}} or
+    {"op": "remove", "id": ...}. Replaying a journal twice gives the same
+    result, since each line holds the full state of its object.
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a Journal writing to file_path
+        """
+        self.file_path = file_path
+        self.rotated_path = "{}.1".format(file_path)
+        self.entries = 0
+        self._file = None
+
+    def append(self, records: List[dict]):
+        """ Append records and fsync them
+        """
+        if self._file is None:
+            self._file = open(self.file_path, 'a')
+        self._file.write("".join(json.dumps(r) + "\n" for r in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries += len(records)
+
+    def close(self):
+        """ Close the journal file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def rotate(self) -> str:
+        """ Move the journal to rotated_path, where it is kept until a
+        snapshot including it is written, and start a new one
+        """
+        self.close()
+        self.entries = 0
+        if not path.exists(self.file_path):
+            return self.rotated_path
+        if path.exists(self.rotated_path):
+            # A snapshot including rotated_path was never written
+            with open(self.file_path, 'r') as src, \
+                    open(self.rotated_path, 'a') as dst:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.file_path)
+        else:
+            os.replace(self.file_path, self.rotated_path)
+        fsync_dir(self.file_path)
+        return self.rotated_path
+
+    def replay(self) -> Iterator[dict]:
+        """ Yield the records of rotated_path then file_path, counting
+        them in entries so a large journal is compacted after a restart
+
+        A torn last line, left by a crash, is cut off once replayed, so
+        that the next records are not appended after it.
+        """
+        self.entries = 0
+        for file_path in (self.rotated_path, self.file_path):
+            end = 0
+            for record, end in scan_journal(file_path):
+                self.entries += 1
+                yield record
+            if path.exists(file_path) and path.getsize(file_path) > end:
+                truncate(file_path, end)
+
+
+def scan_journal(file_path: str) -> Iterator[Tuple[dict, int]]:
+    """ Yield (record, offset of the end of its line) of a journal file,
+    up to the first torn or invalid line
+    """
+    if not path.exists(file_path):
+        return
+    end = 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            end += len(line)
+            yield record, end
+
+
+def read_journal(file_path: str) -> Iterator[dict]:
+    """ Yield the records of a journal file, ignoring a torn last line
+    """
+    for record, _ in scan_journal(file_path):
+        yield record
+
+
+def truncate(file_path: str, size: int):
+    """ Cut file_path to size bytes, durably
+    """
+    with open(file_path, 'r+b') as f:
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
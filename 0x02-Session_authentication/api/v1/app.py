@@ -3,9 +3,12 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.auth import PathMatcher
+from api.v1.auth.session_auth import SessionAuth
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.hashers import Overloaded
 import os
 
 
@@ -17,10 +20,20 @@ auth = None
 if os.getenv('AUTH_TYPE') == 'auth':
     from api.v1.auth.auth import Auth
     auth = Auth()
+elif os.getenv('AUTH_TYPE') == 'session_auth':
+    auth = SessionAuth()
+elif os.getenv('AUTH_TYPE') == 'session_db_auth':
+    from api.v1.auth.session_db_auth import SessionDBAuth
+    auth = SessionDBAuth()
 else:
     from api.v1.auth.basic_auth import BasicAuth
     auth = BasicAuth()
 
+paths = ['/api/v1/status/', '/api/v1/unauthorized/', '/api/v1/forbidden/']
+if isinstance(auth, SessionAuth):
+    paths.append('/api/v1/auth_session/login/')
+excluded_paths = PathMatcher(paths)
+
 
 @app.errorhandler(401)
 def unauthorized(error) -> str:
@@ -43,17 +56,23 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """ Too many passwords being hashed handler
+    """
+    response = jsonify({"error": "Service unavailable"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.before_request
 def check_auth_and_authorization():
     """ Check if auth is None
     """
     if auth is not None:
-        excluded_paths = ['/api/v1/status/',
-                          '/api/v1/unauthorized/',
-                          '/api/v1/forbidden/']
         if auth.require_auth(request.path, excluded_paths):
             auth_header = auth.authorization_header(request)
-            if auth_header is None:
+            if auth_header is None and auth.session_cookie(request) is None:
                 abort(401)
 
             request.current_user = auth.current_user(request)
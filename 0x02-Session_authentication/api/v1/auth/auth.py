@@ -2,30 +2,73 @@
 """ Authentication module
 """
 from flask import request
-from typing import List, TypeVar
+from functools import lru_cache
+from os import getenv
+from typing import Iterable, List, Tuple, TypeVar
+
+
+class PathMatcher:
+    """ Excluded paths compiled once: a set of exact paths and a trie of
+    the prefixes of paths ending with '*'
+    """
+    def __init__(self, excluded_paths: Iterable[str]):
+        """ Compile excluded_paths """
+        self.paths = tuple(excluded_paths)
+        self.exact = set()
+        self.prefixes = {}
+        for excluded_path in self.paths:
+            if excluded_path.endswith('*'):
+                node = self.prefixes
+                for char in excluded_path[:-1]:  # Remove the asterisk
+                    node = node.setdefault(char, {})
+                node[None] = True
+            else:
+                self.exact.add(excluded_path)
+
+    def __len__(self) -> int:
+        """ Number of excluded paths """
+        return len(self.paths)
+
+    def match(self, path: str) -> bool:
+        """ Checks if the normalized path is excluded """
+        if path in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if None in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return None in node
+
+
+@lru_cache(maxsize=64)
+def compile_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """ Cached PathMatcher of excluded_paths """
+    return PathMatcher(excluded_paths)
 
 
 class Auth:
     """ Handles Basic Authentiction
     """
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
-        """Checks if auth is required"""
+        """Checks if auth is required
+
+        excluded_paths may be a list, compiled and cached on first use,
+        or a PathMatcher.
+        """
         if path is None:
             return True
 
         if excluded_paths is None or len(excluded_paths) < 1:
             return True
 
-        normalized_path = path.rstrip('/') + '/'
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*'):
-                prefix = excluded_path[:-1]  # Remove the asterisk
-                if normalized_path.startswith(prefix):
-                    return False
-            elif normalized_path == excluded_path:
-                return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
 
-        return True
+        normalized_path = path.rstrip('/') + '/'
+        return not excluded_paths.match(normalized_path)
 
     def authorization_header(self, request=None) -> str:
         """ Checks authorisatin header
@@ -42,3 +85,11 @@ class Auth:
         """ Get current user
         """
         return None
+
+    def session_cookie(self, request=None) -> str:
+        """ Value of the session cookie, named $SESSION_NAME
+        """
+        if request is None:
+            return None
+
+        return request.cookies.get(getenv('SESSION_NAME', '_my_session_id'))
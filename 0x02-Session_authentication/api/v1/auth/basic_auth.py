@@ -2,14 +2,88 @@
 """ Basic Authentication module
 """
 import base64
+import hmac
+import os
+import threading
+import time
 from api.v1.auth.auth import Auth
+from collections import OrderedDict
 from models.user import User
 from typing import TypeVar
 
 
+class CredentialCache():
+    """ LRU cache, with expiry, of verified Authorization headers
+
+    Headers are stored as an HMAC under a per-process random key, mapped
+    to the user id, email and password hash they were verified against:
+    an entry is dropped when the user is removed or its email or
+    password has changed since.
+    """
+
+    def __init__(self, size: int = 1024, ttl: float = 300):
+        """ Initialize a CredentialCache
+        """
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, authorization_header: str) -> bytes:
+        """ Keyed hash of a header
+        """
+        return hmac.new(self._key, authorization_header.encode(),
+                        'sha256').digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """ User verified for the header, or None
+        """
+        if not isinstance(authorization_header, str):
+            return None
+        digest = self._digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                user_id, email, password, expires = entry
+                user = User.get(user_id)
+                if user is not None and user.email == email and \
+                        user.password == password and \
+                        time.monotonic() < expires:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return user
+                del self._entries[digest]
+            self.misses += 1
+        return None
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """ Cache the user verified for the header
+        """
+        digest = self._digest(authorization_header)
+        with self._lock:
+            self._entries[digest] = (user.id, user.email, user.password,
+                                     time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Drop all entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+
 class BasicAuth(Auth):
     """ Basic Auth class
     """
+    credential_cache = CredentialCache(
+        int(os.getenv('BASIC_AUTH_CACHE_SIZE', '1024')),
+        float(os.getenv('BASIC_AUTH_CACHE_TTL', '300')))
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         """ Extract base64 authorization header
@@ -90,10 +164,19 @@ class BasicAuth(Auth):
         """
         auth_header = self.authorization_header(request)
 
-        decoded_header = self.decode_base64_authorization_header(auth_header)
+        user = self.credential_cache.get(auth_header)
+        if user is not None:
+            return user
+
+        base64_header = self.extract_base64_authorization_header(auth_header)
+
+        decoded_header = self.decode_base64_authorization_header(
+            base64_header)
 
         user_email, user_pwd = self.extract_user_credentials(decoded_header)
 
         user = self.user_object_from_credentials(user_email, user_pwd)
 
+        if user is not None:
+            self.credential_cache.put(auth_header, user)
         return user
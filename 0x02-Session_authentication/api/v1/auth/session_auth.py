@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+""" Session Authentication module
+"""
+import logging
+import threading
+import time
+import uuid
+from api.v1.auth.auth import Auth
+from datetime import datetime, timedelta
+from models.user import User
+from os import getenv
+from typing import Iterable, Tuple, TypeVar
+
+
+class SessionAuth(Auth):
+    """ Session authentication: the session cookie is looked up in a
+    session id -> user id mapping, so authenticated requests involve no
+    password hashing
+
+    Sessions expire SESSION_DURATION seconds after their creation (never
+    if 0) and expired ones are dropped by a background thread every
+    SESSION_SWEEP_INTERVAL seconds.
+    """
+
+    def __init__(self, session_duration: int = None,
+                 sweep_interval: float = None):
+        """ Initialize a SessionAuth
+        """
+        if session_duration is None:
+            try:
+                session_duration = int(getenv('SESSION_DURATION', '0'))
+            except ValueError:
+                session_duration = 0
+        if sweep_interval is None:
+            sweep_interval = float(getenv('SESSION_SWEEP_INTERVAL', '60'))
+        self.session_duration = session_duration
+        self.sweep_interval = sweep_interval
+        # session id -> (user id, created_at)
+        self.user_id_by_session_id = {}
+        if self.session_duration > 0 and self.sweep_interval > 0:
+            sweeper = threading.Thread(target=self._sweeper, daemon=True)
+            sweeper.start()
+
+    def _store(self, session_id: str, user_id: str, created_at: datetime):
+        """ Store a session
+        """
+        self.user_id_by_session_id[session_id] = (user_id, created_at)
+
+    def _lookup(self, session_id: str) -> Tuple[str, datetime]:
+        """ (user id, created_at) of a session, None if unknown
+        """
+        return self.user_id_by_session_id.get(session_id)
+
+    def _discard(self, session_id: str):
+        """ Drop a session
+        """
+        self.user_id_by_session_id.pop(session_id, None)
+
+    def _sessions(self) -> Iterable[Tuple[str, datetime]]:
+        """ (session id, created_at) of all sessions
+        """
+        return [(session_id, created_at) for session_id, (_, created_at)
+                in list(self.user_id_by_session_id.items())]
+
+    def _expired(self, created_at: datetime, now: datetime) -> bool:
+        """ True if a session created at created_at has expired at now
+        """
+        if self.session_duration <= 0:
+            return False
+        return created_at + timedelta(seconds=self.session_duration) < now
+
+    def create_session(self, user_id: str = None) -> str:
+        """ Create a session for user_id and return its id
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        session_id = str(uuid.uuid4())
+        self._store(session_id, user_id, datetime.utcnow())
+        return session_id
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """ User id of a live session, None if unknown or expired
+        """
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        entry = self._lookup(session_id)
+        if entry is None:
+            return None
+        user_id, created_at = entry
+        if self._expired(created_at, datetime.utcnow()):
+            self._discard(session_id)
+            return None
+        return user_id
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """ User of the session cookie
+        """
+        user_id = self.user_id_for_session_id(self.session_cookie(request))
+        if user_id is None:
+            return None
+        return User.get(user_id)
+
+    def destroy_session(self, request=None) -> bool:
+        """ End the session of the session cookie (logout)
+        """
+        session_id = self.session_cookie(request)
+        if self.user_id_for_session_id(session_id) is None:
+            return False
+        self._discard(session_id)
+        return True
+
+    def sweep(self) -> int:
+        """ Drop expired sessions and return how many were dropped
+        """
+        now = datetime.utcnow()
+        expired = [session_id for session_id, created_at in self._sessions()
+                   if self._expired(created_at, now)]
+        for session_id in expired:
+            self._discard(session_id)
+        return len(expired)
+
+    def _sweeper(self):
+        """ Sweep every sweep_interval seconds
+        """
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logging.getLogger(__name__).exception("session sweep failed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Session DB Authentication module
+"""
+from api.v1.auth.session_auth import SessionAuth
+from datetime import datetime
+from models.user_session import UserSession
+from typing import Iterable, Tuple
+
+
+class SessionDBAuth(SessionAuth):
+    """ SessionAuth whose sessions are UserSession objects, so they are
+    saved with the models (.db_UserSession.json) and survive restarts
+
+    Looking a session up is still a dict access, the objects being kept
+    in memory by models.base.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """ Initialize a SessionDBAuth, loading the saved sessions
+        """
+        UserSession.load_from_file()
+        super().__init__(*args, **kwargs)
+
+    def _store(self, session_id: str, user_id: str, created_at: datetime):
+        """ Save a session
+        """
+        UserSession(id=session_id, user_id=user_id,
+                    created_at=created_at).save()
+
+    def _lookup(self, session_id: str) -> Tuple[str, datetime]:
+        """ (user id, created_at) of a session, None if unknown
+        """
+        user_session = UserSession.get(session_id)
+        if user_session is None:
+            return None
+        return user_session.user_id, user_session.created_at
+
+    def _discard(self, session_id: str):
+        """ Remove a session
+        """
+        user_session = UserSession.get(session_id)
+        if user_session is not None:
+            user_session.remove()
+
+    def _sessions(self) -> Iterable[Tuple[str, datetime]]:
+        """ (session id, created_at) of all sessions
+        """
+        return [(user_session.id, user_session.created_at)
+                for user_session in UserSession.all()]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Tests of api.v1.auth.auth
+"""
+import pytest
+
+from api.v1.auth.auth import Auth, PathMatcher, compile_paths
+
+EXCLUDED = ['/api/v1/status/', '/api/v1/unauthorized/', '/api/v1/stat*',
+            '/api/v1/auth_session/login/']
+
+
+def require_auth_loop(path: str, excluded_paths: list) -> bool:
+    """ require_auth as a scan of excluded_paths, for comparison """
+    normalized_path = path.rstrip('/') + '/'
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            if normalized_path.startswith(excluded_path[:-1]):
+                return False
+        elif normalized_path == excluded_path:
+            return False
+    return True
+
+
+@pytest.mark.parametrize("path", [
+    '/api/v1/status', '/api/v1/status/', '/api/v1/stats', '/api/v1/stat',
+    '/api/v1/sta', '/api/v1/users', '/api/v1/unauthorized',
+    '/api/v1/unauthorized/x', '/api/v1/auth_session/login', '/', '',
+])
+def test_require_auth(path):
+    """ PathMatcher decides as a scan of the excluded paths """
+    expected = require_auth_loop(path, EXCLUDED)
+    assert Auth().require_auth(path, EXCLUDED) is expected
+    assert Auth().require_auth(path, PathMatcher(EXCLUDED)) is expected
+
+
+def test_require_auth_without_excluded_paths():
+    """ Auth is required for None paths and empty exclusions """
+    assert Auth().require_auth(None, EXCLUDED) is True
+    assert Auth().require_auth('/api/v1/status', None) is True
+    assert Auth().require_auth('/api/v1/status', []) is True
+    assert Auth().require_auth('/api/v1/status', PathMatcher([])) is True
+
+
+def test_match_wildcard_only():
+    """ '*' alone excludes every path """
+    matcher = PathMatcher(['*'])
+    assert matcher.match('/') and matcher.match('/api/v1/users/')
+
+
+def test_compile_paths_cached():
+    """ The same excluded paths are compiled once """
+    assert compile_paths(tuple(EXCLUDED)) is compile_paths(tuple(EXCLUDED))
+    assert len(compile_paths(tuple(EXCLUDED))) == len(EXCLUDED)
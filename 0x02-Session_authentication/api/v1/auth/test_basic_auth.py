@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" Tests of api.v1.auth.basic_auth
+"""
+import base64
+
+import pytest
+
+from api.v1.auth.basic_auth import BasicAuth
+from models import base
+from models.user import User
+
+
+class Request():
+    """ Request carrying an Authorization header """
+
+    def __init__(self, email: str, password: str):
+        """ Initialize a Request """
+        credentials = "{}:{}".format(email, password).encode()
+        self.headers = {"Authorization": "Basic {}".format(
+            base64.b64encode(credentials).decode())}
+
+
+@pytest.fixture
+def user(tmp_path, monkeypatch):
+    """ A saved user, in an empty store in a temporary directory """
+    monkeypatch.chdir(tmp_path)
+    for table in (base.DATA, base.INDEXES, base.ORDERS):
+        table.pop(User.__name__, None)
+    User.load_from_file()
+    BasicAuth.credential_cache.clear()
+    user = User(email="bob@hbtn.io")
+    user.password = "H0lberton"
+    user.save()
+    yield user
+    BasicAuth.credential_cache.clear()
+
+
+def test_cache_hit_skips_password_check(user, monkeypatch):
+    """ A header already verified is not hashed again """
+    auth = BasicAuth()
+    request = Request("bob@hbtn.io", "H0lberton")
+    assert auth.current_user(request) == user
+
+    def fail(self, pwd):
+        raise AssertionError("is_valid_password called")
+
+    monkeypatch.setattr(User, "is_valid_password", fail)
+    hits = BasicAuth.credential_cache.hits
+    assert auth.current_user(request) == user
+    assert BasicAuth.credential_cache.hits == hits + 1
+
+
+def test_password_change_invalidates_entry(user):
+    """ The old password is refused once it has been changed """
+    auth = BasicAuth()
+    request = Request("bob@hbtn.io", "H0lberton")
+    assert auth.current_user(request) == user
+
+    user.password = "N3w password"
+    user.save()
+    assert auth.current_user(request) is None
+    assert auth.current_user(Request("bob@hbtn.io", "N3w password")) == user
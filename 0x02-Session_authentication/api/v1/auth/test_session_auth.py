@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+""" Tests of api.v1.auth.session_auth
+"""
+import threading
+
+from api.v1.auth.session_auth import SessionAuth
+
+
+def test_sweeper_survives_errors(monkeypatch):
+    """ A failing sweep is logged and the next ones still run """
+    swept = threading.Event()
+    calls = []
+
+    def sweep(self):
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("dictionary changed size during iteration")
+        swept.set()
+        return 0
+
+    monkeypatch.setattr(SessionAuth, "sweep", sweep)
+    SessionAuth(session_duration=60, sweep_interval=0.01)
+    assert swept.wait(5)
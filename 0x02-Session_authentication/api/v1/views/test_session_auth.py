@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+""" Tests of api.v1.views.session_auth
+"""
+import base64
+import threading
+
+import pytest
+
+from api.v1 import app as api
+from api.v1.auth.auth import PathMatcher
+from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.session_auth import SessionAuth
+from models import base, hashers
+from models.user import User
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """ Test client of the API, with one user in an empty store """
+    monkeypatch.chdir(tmp_path)
+    for table in (base.DATA, base.INDEXES, base.ORDERS):
+        table.pop(User.__name__, None)
+    User.load_from_file()
+    user = User(email="bob@hbtn.io")
+    user.password = "H0lberton"
+    user.save()
+    return api.app.test_client()
+
+
+def use_auth(monkeypatch, auth):
+    """ Serve the API with auth, excluding the paths app.py would """
+    paths = ['/api/v1/status/']
+    if isinstance(auth, SessionAuth):
+        paths.append('/api/v1/auth_session/login/')
+    monkeypatch.setattr(api, "auth", auth)
+    monkeypatch.setattr(api, "excluded_paths", PathMatcher(paths))
+
+
+def test_session_routes_without_session_auth(client, monkeypatch):
+    """ Basic authentication has no session routes """
+    use_auth(monkeypatch, BasicAuth())
+    form = {"email": "bob@hbtn.io", "password": "H0lberton"}
+    response = client.post("/api/v1/auth_session/login", data=form)
+    assert response.status_code == 401
+
+    credentials = base64.b64encode(b"bob@hbtn.io:H0lberton").decode()
+    headers = {"Authorization": "Basic {}".format(credentials)}
+    response = client.post("/api/v1/auth_session/login", data=form,
+                           headers=headers)
+    assert response.status_code == 404
+    response = client.delete("/api/v1/auth_session/logout", headers=headers)
+    assert response.status_code == 404
+
+
+def test_session_login_logout(client, monkeypatch):
+    """ Login sets the session cookie, logout ends the session """
+    use_auth(monkeypatch, SessionAuth(session_duration=0, sweep_interval=0))
+    form = {"email": "bob@hbtn.io", "password": "H0lberton"}
+    response = client.post("/api/v1/auth_session/login", data=form)
+    assert response.status_code == 200
+    assert response.get_json()["email"] == "bob@hbtn.io"
+
+    assert client.get("/api/v1/users/me").status_code == 200
+    assert client.delete("/api/v1/auth_session/logout").status_code == 200
+    assert client.get("/api/v1/users/me").status_code == 403
+
+
+def test_login_overloaded(client, monkeypatch):
+    """ Logins answer 503 while the password hashers are saturated """
+    monkeypatch.setattr(User, "hasher", hashers.PBKDF2Hasher(1000))
+    user = User.search({"email": "bob@hbtn.io"})[0]
+    user.password = "H0lberton"
+    user.save()
+    monkeypatch.setattr(hashers, "SLOTS", threading.BoundedSemaphore(1))
+    hashers.SLOTS.acquire()
+
+    use_auth(monkeypatch, SessionAuth(session_duration=0, sweep_interval=0))
+    form = {"email": "bob@hbtn.io", "password": "H0lberton"}
+    response = client.post("/api/v1/auth_session/login", data=form)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    use_auth(monkeypatch, BasicAuth())
+    credentials = base64.b64encode(b"bob@hbtn.io:H0lberton").decode()
+    headers = {"Authorization": "Basic {}".format(credentials)}
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.status_code == 503
+
+    hashers.SLOTS.release()
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Tests of api.v1.views.users
+"""
+import pytest
+
+from api.v1 import app as api
+from models import base
+from models.user import User
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """ Test client of the API without auth, with 250 users """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "auth", None)
+    for table in (base.DATA, base.INDEXES, base.ORDERS):
+        table.pop(User.__name__, None)
+    User.load_from_file()
+    for i in range(250):
+        User(email="user{}@hbtn.io".format(i)).save()
+    return api.app.test_client()
+
+
+def read_pages(client, query: str) -> list:
+    """ (ids, X-Next-Cursor) of each page, following the cursors """
+    pages, cursor = [], None
+    while True:
+        url = "/api/v1/users?" + query
+        if cursor:
+            url += "&cursor=" + cursor
+        response = client.get(url)
+        assert response.status_code == 200
+        cursor = response.headers.get("X-Next-Cursor")
+        pages.append(([user["id"] for user in response.get_json()], cursor))
+        if cursor is None:
+            return pages
+
+
+def test_stream_with_limit(client):
+    """ Streamed pages carry the same X-Next-Cursor as plain ones """
+    streamed = read_pages(client, "limit=120&stream=true")
+    assert streamed == read_pages(client, "limit=120")
+    assert [len(ids) for ids, _ in streamed] == [120, 120, 10]
+    assert [cursor for _, cursor in streamed] == \
+        [streamed[0][0][-1], streamed[1][0][-1], None]
+
+
+def test_stream_all(client):
+    """ Without limit every user is streamed, with no cursor """
+    response = client.get("/api/v1/users?stream=true")
+    assert "X-Next-Cursor" not in response.headers
+    ids = [user["id"] for user in response.get_json()]
+    assert ids == sorted(user.id for user in User.all())
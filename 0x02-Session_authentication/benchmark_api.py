@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+""" Load test of the API, in process (Flask test client) and over a
+local socket, reported as JSON
+
+    ./benchmark_api.py [-u users] [-n requests] [-c concurrency]
+                       [-t client,socket] [-s scenario,...] [-o out.json]
+
+The API runs in a temporary directory on a table of --users users, so
+.db_User.json is left alone. Each scenario sends --requests requests
+from --concurrency threads; throughput and p50/p95/p99 latency are
+reported per scenario and transport.
+"""
+import argparse
+import base64
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Tuple
+
+PASSWORD = "H0lbertonSchool98!"
+AUTH_USERS = 100
+
+
+class ClientTransport():
+    """ Requests through the Flask test client
+    """
+
+    def __init__(self, app):
+        """ Initialize a ClientTransport
+        """
+        # cookies are sent explicitly, as over the socket
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, headers: Dict = None,
+                body: bytes = None) -> Tuple[int, bytes]:
+        """ (status, body) of a request
+        """
+        response = self.client.open(path, method=method,
+                                    headers=headers or {}, data=body)
+        return response.status_code, response.get_data()
+
+
+class SocketTransport():
+    """ Requests over HTTP to a local server
+    """
+
+    def __init__(self, address: Tuple[str, int]):
+        """ Initialize a SocketTransport
+        """
+        self.connection = http.client.HTTPConnection(*address)
+
+    def request(self, method: str, path: str, headers: Dict = None,
+                body: bytes = None) -> Tuple[int, bytes]:
+        """ (status, body) of a request
+        """
+        self.connection.request(method, path, body=body,
+                                headers=headers or {})
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.will_close:
+            self.connection.close()
+        return response.status, data
+
+
+def start_server(app) -> Tuple[str, int]:
+    """ Serve app on a free local port from a thread, return its address
+    """
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    """ q-th quantile of sorted latencies, in ms
+    """
+    if not latencies:
+        return 0.0
+    return latencies[int(round(q * (len(latencies) - 1)))] * 1e3
+
+
+def run(step: Callable, expected: Tuple[int, ...], transport: Callable,
+        requests: int, concurrency: int) -> Dict:
+    """ Call step(transport, i) for i in range(requests) from concurrency
+    threads, each with its own transport, and return the statistics
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i: int):
+        if not hasattr(local, "transport"):
+            local.transport = transport()
+        start = time.perf_counter()
+        try:
+            status = step(local.transport, i)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status not in expected:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors[0],
+        "seconds": round(elapsed, 4),
+        "throughput": round(requests / (elapsed or 1), 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def add_users(emails: Iterable[str]) -> List[str]:
+    """ Add users sharing PASSWORD, written in one snapshot, and return
+    their ids
+    """
+    from models import base, hashers
+    from models.user import User
+    encoded = hashers.encode(User.hasher, PASSWORD)
+    users = {}
+    for i, email in enumerate(emails):
+        user = User(email=email, _password=encoded, first_name="User",
+                    last_name=str(i))
+        users[user.id] = user
+    base.DATA.setdefault('User', {}).update(users)
+    User.save_to_file()
+    User.load_from_file()
+    return list(users)
+
+
+def populate(count: int) -> List[str]:
+    """ Replace the users by count users sharing PASSWORD and return their
+    ids
+    """
+    from models import base
+    base.DATA['User'] = {}
+    return add_users("user{}@hbtn.io".format(i) for i in range(count))
+
+
+def basic_header(i: int) -> Dict:
+    """ Authorization header of one of the first AUTH_USERS users
+    """
+    credentials = "user{}@hbtn.io:{}".format(i, PASSWORD)
+    return {"Authorization": "Basic {}".format(
+        base64.b64encode(credentials.encode()).decode())}
+
+
+def scenarios(user_ids: List[str], session_auth) -> Dict:
+    """ name -> (step, expected statuses, setup); setup, if not None, is
+    called with the number of requests before the scenario runs, untimed,
+    to add the users it needs
+    """
+    auth_users = min(AUTH_USERS, len(user_ids))
+    headers = [basic_header(i) for i in range(auth_users)]
+    json_headers = [dict(h, **{"Content-Type": "application/json"})
+                    for h in headers]
+    updated, deleted = [], []
+    cookies = {}
+    run_id = str(time.time_ns())
+
+    def fixture(ids: List[str], name: str) -> Callable:
+        def setup(requests: int):
+            ids[:] = add_users("bench-{}-{}-{}@hbtn.io".format(run_id, name, i)
+                               for i in range(requests))
+        return setup
+
+    def status(transport, i):
+        return transport.request("GET", "/api/v1/status")[0]
+
+    def users_get(transport, i):
+        return transport.request(
+            "GET", "/api/v1/users/{}".format(user_ids[i % len(user_ids)]),
+            headers[i % auth_users])[0]
+
+    def users_list(transport, i):
+        return transport.request("GET", "/api/v1/users?limit=100",
+                                 headers[i % auth_users])[0]
+
+    def users_create(transport, i):
+        body = json.dumps({"email": "bench-{}-{}@hbtn.io".format(run_id, i),
+                           "password": PASSWORD})
+        return transport.request("POST", "/api/v1/users",
+                                 json_headers[i % auth_users],
+                                 body.encode())[0]
+
+    def users_update(transport, i):
+        body = json.dumps({"first_name": "Bench{}".format(i)})
+        return transport.request(
+            "PUT", "/api/v1/users/{}".format(updated[i]),
+            json_headers[i % auth_users], body.encode())[0]
+
+    def users_delete(transport, i):
+        return transport.request(
+            "DELETE", "/api/v1/users/{}".format(deleted[i]),
+            headers[i % auth_users])[0]
+
+    steps = {
+        "status": (status, (200,), None),
+        "users_get": (users_get, (200,), None),
+        "users_list": (users_list, (200,), None),
+        "users_create": (users_create, (201,), None),
+        "users_update": (users_update, (200,), fixture(updated, "update")),
+        "users_delete": (users_delete, (200,), fixture(deleted, "delete")),
+    }
+    if session_auth is None:
+        return steps
+
+    cookie_name = os.getenv('SESSION_NAME', '_my_session_id')
+    for user_id in user_ids[:auth_users]:
+        cookies[user_id] = session_auth.create_session(user_id)
+
+    def session_login(transport, i):
+        body = "email=user{}%40hbtn.io&password={}".format(
+            i % auth_users, PASSWORD)
+        code, _ = transport.request(
+            "POST", "/api/v1/auth_session/login",
+            {"Content-Type": "application/x-www-form-urlencoded"},
+            body.encode())
+        return code
+
+    def session_me(transport, i):
+        user_id = user_ids[i % auth_users]
+        return transport.request(
+            "GET", "/api/v1/users/me",
+            {"Cookie": "{}={}".format(cookie_name, cookies[user_id])})[0]
+
+    steps["session_login"] = (session_login, (200,), None)
+    steps["session_me"] = (session_me, (200,), None)
+    return steps
+
+
+def main() -> None:
+    """ command line entry point """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-u", "--users", type=int, default=1000,
+                        help="users in the table")
+    parser.add_argument("-n", "--requests", type=int, default=500,
+                        help="requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-t", "--transports", default="client,socket")
+    parser.add_argument("-s", "--scenarios", default=None,
+                        help="comma separated scenarios, by default all")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSON report file, - for stdout")
+    args = parser.parse_args()
+
+    output = args.output
+    if output != "-":
+        output = os.path.abspath(output)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp())
+
+    import api.v1.app as api_app
+    from api.v1.auth.auth import PathMatcher
+    from api.v1.auth.basic_auth import BasicAuth
+    try:
+        from api.v1.auth.session_auth import SessionAuth
+    except ImportError:
+        SessionAuth = None
+    user_ids = populate(args.users)
+    if not isinstance(api_app.auth, BasicAuth):
+        api_app.auth = BasicAuth()
+    basic_auth = api_app.auth
+    basic_paths = api_app.excluded_paths
+    session_auth = SessionAuth() if SessionAuth is not None else None
+    # app.py only excludes the login path from session authentication
+    session_paths = PathMatcher(list(basic_paths.paths) +
+                                ['/api/v1/auth_session/login/'])
+
+    address = None
+    transports = {}
+    for name in args.transports.split(","):
+        if name == "client":
+            transports[name] = lambda: ClientTransport(api_app.app)
+        elif name == "socket":
+            address = address or start_server(api_app.app)
+            transports[name] = lambda: SocketTransport(address)
+        else:
+            parser.error("unknown transport {}".format(name))
+
+    results = []
+    for transport_name, transport in transports.items():
+        steps = scenarios(user_ids, session_auth)
+        names = args.scenarios.split(",") if args.scenarios else list(steps)
+        for name in names:
+            if name not in steps:
+                parser.error("unknown scenario {}".format(name))
+            step, expected, setup = steps[name]
+            if setup is not None:
+                setup(args.requests)
+            # session scenarios authenticate with the session cookie
+            if name.startswith("session"):
+                api_app.auth = session_auth
+                api_app.excluded_paths = session_paths
+            else:
+                api_app.auth = basic_auth
+                api_app.excluded_paths = basic_paths
+            result = run(step, expected, transport, args.requests,
+                         args.concurrency)
+            result.update(scenario=name, transport=transport_name)
+            results.append(result)
+            print("{:<14} {:<7} {:10.1f} req/s  p50 {:8.3f} ms  "
+                  "p99 {:8.3f} ms  {} errors".format(
+                      name, transport_name, result["throughput"],
+                      result["p50_ms"], result["p99_ms"], result["errors"]),
+                  file=sys.stderr)
+
+    report = {
+        "app": os.path.basename(os.path.dirname(os.path.abspath(__file__))),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    if output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
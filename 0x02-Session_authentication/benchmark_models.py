@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+""" Benchmarks for models.base / models.user
+
+    ./benchmark_models.py [count]
+"""
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+from models import base, hashers
+from models.base import TIMESTAMP_FORMAT, format_timestamp, parse_timestamp
+from models.user import User
+
+
+class DictUser():
+    """ User attributes in a per-instance __dict__, as before __slots__
+    """
+
+    def __init__(self, **kwargs: dict):
+        """ Initialize a DictUser
+        """
+        self.id = kwargs.get('id')
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+def bench_memory(count: int):
+    """ Memory of count users, reported per 1M users
+    """
+    print("memory per 1M users ({} measured)".format(count))
+    for name, cls in (("__dict__", DictUser), ("__slots__", User)):
+        ids = ["{:036d}".format(i) for i in range(count)]
+        tracemalloc.start()
+        users = [cls(id=i, email="{}@hbtn.io".format(i),
+                     _password="0" * 64, first_name="Bob")
+                 for i in ids]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("  {:<10} {:8.1f} MB".format(
+            name, size * 1e6 / count / 1024 / 1024))
+        del users
+
+
+def bench_timestamps(number: int = 100000):
+    """ Timestamp parsing and formatting, and User load/dump round trip
+    """
+    text = "2023-08-10T00:59:22"
+    value = datetime.strptime(text, TIMESTAMP_FORMAT)
+    assert parse_timestamp(text) == value
+    assert format_timestamp(value) == text
+    runs = [("strptime", lambda: datetime.strptime(text, TIMESTAMP_FORMAT)),
+            ("parse_timestamp", lambda: parse_timestamp(text)),
+            ("strftime", lambda: value.strftime(TIMESTAMP_FORMAT)),
+            ("format_timestamp", lambda: format_timestamp(value))]
+    print("timestamps ({} calls)".format(number))
+    for name, run in runs:
+        seconds = timeit.timeit(run, number=number) / number
+        print("  {:<24} {:8.3f} us".format(name, seconds * 1e6))
+
+    obj_json = User(email="bob@hbtn.io", created_at=text,
+                    updated_at=text).to_json(True)
+    for raw in (False, True):
+        base.RAW_TIMESTAMPS = raw
+        assert User(**obj_json).to_json(True) == obj_json
+        seconds = timeit.timeit(lambda: User(**obj_json).to_json(True),
+                                number=number) / number
+        print("  {:<24} {:8.3f} us".format(
+            "User(**json).to_json" + (" raw" if raw else ""), seconds * 1e6))
+    base.RAW_TIMESTAMPS = False
+
+
+def bench_passwords(logins: int = 32):
+    """ Logins/sec per hasher and cost setting, on one thread and through
+    hashers.POOL
+    """
+    settings = [("sha256", hashers.SHA256Hasher()),
+                ("pbkdf2 100k", hashers.PBKDF2Hasher(100000)),
+                ("pbkdf2 260k", hashers.PBKDF2Hasher(260000)),
+                ("pbkdf2 600k", hashers.PBKDF2Hasher(600000)),
+                ("scrypt n=2^14", hashers.ScryptHasher(2 ** 14)),
+                ("scrypt n=2^15", hashers.ScryptHasher(2 ** 15))]
+    print("logins/sec ({} workers in pool)".format(
+        hashers.POOL._max_workers))
+    for name, hasher in settings:
+        encoded = hasher.encode("H0lbertonSchool98!")
+        start = time.perf_counter()
+        for _ in range(logins):
+            assert hasher.verify("H0lbertonSchool98!", encoded)
+        single = logins / (time.perf_counter() - start)
+        start = time.perf_counter()
+        futures = [hashers.POOL.submit(hasher.verify, "H0lbertonSchool98!",
+                                       encoded) for _ in range(logins)]
+        assert all(f.result() for f in futures)
+        pooled = logins / (time.perf_counter() - start)
+        print("  {:<14} {:10.1f} /s   pool {:10.1f} /s".format(
+            name, single, pooled))
+
+
+if __name__ == "__main__":
+    bench_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    bench_timestamps()
+    bench_passwords()
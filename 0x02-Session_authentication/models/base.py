@@ -1,20 +1,107 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import Callable, TypeVar, List, Iterable, Tuple
+from os import getenv, path
+from models.storage import (Journal, LazyStore, is_line_snapshot,
+                            load_snapshot, write_snapshot)
+import atexit
+import os
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+ORDERS = {}
+JOURNALS = {}
+COMPACTIONS = {}
+# journal entries kept before a compaction, at least the object count
+COMPACT_MIN_ENTRIES = 1000
+# write-behind: when FLUSH_INTERVAL > 0, changes are queued in PENDING and
+# persisted every FLUSH_INTERVAL seconds or FLUSH_THRESHOLD changes
+FLUSH_INTERVAL = float(getenv('MODELS_FLUSH_INTERVAL', '0'))
+FLUSH_THRESHOLD = int(getenv('MODELS_FLUSH_THRESHOLD', '100'))
+PENDING = {}
+LOCK = threading.RLock()
+FLUSH_LOCK = threading.Lock()
+FLUSH_EVENT = threading.Event()
+FLUSHER = None
+# objects kept decoded by a lazy store (see Base.__lazy__)
+LAZY_CACHE_SIZE = int(getenv('MODELS_LAZY_CACHE_SIZE', '10000'))
+# created_at/updated_at loaded from file stay strings until first read
+RAW_TIMESTAMPS = getenv('MODELS_RAW_TIMESTAMPS', '') not in ('', '0')
+SLOTS = {}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ datetime of a TIMESTAMP_FORMAT string
+    """
+    if len(value) == 19 and value[10] == 'T':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def format_timestamp(value: datetime) -> str:
+    """ TIMESTAMP_FORMAT string of a datetime
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(timespec='seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+class Timestamp():
+    """ datetime attribute stored in the slot '_<name>', either as a
+    datetime or as its TIMESTAMP_FORMAT string, parsed on first read
+    """
+
+    def __set_name__(self, owner: type, name: str):
+        """ Bind to the slot of name
+        """
+        self.slot = "_{}".format(name)
+
+    def __get__(self, obj, owner: type = None):
+        """ datetime value
+        """
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if type(value) is str:
+            value = parse_timestamp(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        """ Set a datetime, or a TIMESTAMP_FORMAT string
+        """
+        if type(value) is str and not (RAW_TIMESTAMPS and len(value) == 19
+                                       and value[10] == 'T'):
+            value = parse_timestamp(value)
+        setattr(obj, self.slot, value)
 
 
 class Base():
     """ Base class
     """
+    # attributes with a hash index, used by search()
+    __indexes__ = ()
+    # 'file': rewrite .db_<Class>.json on each change
+    # 'journal': append each change to .db_<Class>.journal, compacted
+    #            into .db_<Class>.json in the background
+    __storage__ = getenv('MODELS_STORAGE', 'file')
+    # load_from_file() maps .db_<Class>.json and decodes objects on access
+    __lazy__ = getenv('MODELS_LAZY', '') not in ('', '0')
+    # attributes are stored in slots, without a per-instance __dict__,
+    # in subclasses declaring __slots__ too
+    __slots__ = ('id', '_created_at', '_updated_at')
+    created_at = Timestamp()
+    updated_at = Timestamp()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -23,15 +110,13 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = kwargs.get('created_at')
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = kwargs.get('updated_at')
         else:
             self.updated_at = datetime.utcnow()
 
@@ -48,15 +133,42 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self.attributes():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
         return result
 
+    def attributes(self) -> Iterable[tuple]:
+        """ (name, value) of the attributes set on the object, slots in
+        definition order then __dict__; Timestamp values may be strings
+        """
+        cls = self.__class__
+        names = SLOTS.get(cls)
+        if names is None:
+            names = []
+            for klass in reversed(cls.__mro__):
+                slots = klass.__dict__.get('__slots__', ())
+                if isinstance(slots, str):
+                    slots = (slots,)
+                for k in slots:
+                    if k in ('__dict__', '__weakref__'):
+                        continue
+                    if isinstance(getattr(cls, k[1:], None), Timestamp):
+                        names.append((k[1:], k))
+                    else:
+                        names.append((k, k))
+            names = SLOTS[cls] = tuple(names)
+        for key, slot in names:
+            try:
+                yield key, getattr(self, slot)
+            except AttributeError:
+                continue
+        yield from getattr(self, '__dict__', {}).items()
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
@@ -64,13 +176,31 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        INDEXES[s_class] = None
+        ORDERS[s_class] = None
+        if path.exists(file_path):
+            if cls.__lazy__ and is_line_snapshot(file_path):
+                DATA[s_class] = LazyStore(file_path, lambda j: cls(**j),
+                                          LAZY_CACHE_SIZE)
+            else:
+                objs_json = load_snapshot(file_path)
+                for obj_id, obj_json in objs_json.items():
+                    DATA[s_class][obj_id] = cls(**obj_json)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        journal = cls._journal()
+        replayed = False
+        for record in journal.replay():
+            replayed = True
+            if record["op"] == "save":
+                DATA[s_class][record["id"]] = cls(**record["obj"])
+            else:
+                DATA[s_class].pop(record["id"], None)
+        if replayed and cls.__storage__ != 'journal':
+            cls.save_to_file()
+            for file_path in (journal.rotated_path, journal.file_path):
+                if path.exists(file_path):
+                    os.remove(file_path)
+            journal.entries = 0
 
     @classmethod
     def save_to_file(cls):
@@ -78,20 +208,121 @@ class Base():
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        items, written = cls._snapshot_items()
+        write_snapshot(file_path, items)
+        written(file_path)
+
+    @classmethod
+    def _snapshot_items(cls) -> Tuple[Iterable[tuple], Callable]:
+        """ (id, JSON) of all objects as of now, for write_snapshot, and
+        the function to call with the snapshot once written: a lazy store
+        moves over it
+        """
+        store = DATA[cls.__name__]
+        if isinstance(store, LazyStore):
+            items, change = store.snapshot()
+            return items, lambda file_path: store.remap(file_path, change)
+        objs = list(store.items())
+        items = ((obj_id, obj.to_json(True)) for obj_id, obj in objs)
+        return items, lambda file_path: None
+
+    @classmethod
+    def _journal(cls) -> Journal:
+        """ Journal of the class
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(".db_{}.journal".format(s_class))
+        return JOURNALS[s_class]
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def _persist(cls, op: str, obj: TypeVar('Base')):
+        """ Persist one change: op is "save" or "remove"
+        """
+        record = None
+        if cls.__storage__ == 'journal':
+            record = {"op": op, "id": obj.id}
+            if op == "save":
+                record["obj"] = obj.to_json(True)
+        if FLUSH_INTERVAL <= 0:
+            with FLUSH_LOCK:
+                cls._write([record])
+            return
+        with LOCK:
+            pending = PENDING.setdefault(cls.__name__, (cls, []))[1]
+            pending.append(record)
+            _start_flusher()
+        if len(pending) >= FLUSH_THRESHOLD:
+            FLUSH_EVENT.set()
+
+    @classmethod
+    def _write(cls, records: list):
+        """ Write changes: records for the journal, or the whole file
+        """
+        if cls.__storage__ != 'journal':
+            cls.save_to_file()
+            return
+        with LOCK:
+            journal = cls._journal()
+            journal.append(records)
+            if journal.entries > max(COMPACT_MIN_ENTRIES, cls.count()):
+                cls.compact(wait=False)
+
+    @staticmethod
+    def flush():
+        """ Persist every change queued by write-behind
+        """
+        with FLUSH_LOCK:
+            with LOCK:
+                pending = list(PENDING.values())
+                PENDING.clear()
+            for cls, records in pending:
+                cls._write(records)
+
+    @classmethod
+    def compact(cls, wait: bool = True):
+        """ Write a snapshot of all objects and drop the journal it
+        replaces; with wait=False the snapshot is written in a thread
+        """
+        s_class = cls.__name__
+        with LOCK:
+            running = COMPACTIONS.get(s_class)
+            if running is not None and running.is_alive():
+                if not wait:
+                    return
+                running.join()
+            journal = cls._journal()
+            rotated_path = journal.rotate()
+            items, written = cls._snapshot_items()
+
+        def _compact():
+            file_path = ".db_{}.json".format(s_class)
+            write_snapshot(file_path, items)
+            written(file_path)
+            if path.exists(rotated_path):
+                os.remove(rotated_path)
+
+        if wait:
+            _compact()
+            return
+        thread = threading.Thread(target=_compact, daemon=True)
+        COMPACTIONS[s_class] = thread
+        thread.start()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with LOCK:
+            DATA[s_class][self.id] = self
+            order = ORDERS.get(s_class)
+            if order is not None:
+                i = bisect_left(order, self.id)
+                if i == len(order) or order[i] != self.id:
+                    order.insert(i, self.id)
+        self.__class__._index(self)
+        self.__class__._persist("save", self)
 
     def remove(self):
         """ Remove object
@@ -99,7 +330,60 @@ class Base():
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self.__class__._unindex(self.id)
+            if ORDERS.get(s_class) is not None:
+                with LOCK:
+                    order = ORDERS[s_class]
+                    i = bisect_left(order, self.id)
+                    if i < len(order) and order[i] == self.id:
+                        del order[i]
+            self.__class__._persist("remove", self)
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Indexes of the class: attribute -> (value -> {id: None},
+        id -> indexed value), built from all objects on first use
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            indexes = INDEXES[s_class] = {k: ({}, {})
+                                          for k in cls.__indexes__}
+            store = DATA.get(s_class, {})
+            if indexes and isinstance(store, LazyStore):
+                # values are read from the snapshot, objects not decoded
+                for k, (by_value, by_id) in indexes.items():
+                    for obj_id, value in store.scan(k):
+                        _add_to_index(by_value, by_id, obj_id, value)
+            elif indexes:
+                for obj in list(store.values()):
+                    cls._index(obj)
+        return INDEXES[s_class]
+
+    @classmethod
+    def _index(cls, obj: TypeVar('Base')):
+        """ Add obj to the indexes, or move it to its current values
+        """
+        cls._unindex(obj.id)
+        for k, (by_value, by_id) in cls._indexes().items():
+            _add_to_index(by_value, by_id, obj.id, getattr(obj, k, None))
+
+    @classmethod
+    def _unindex(cls, obj_id: str):
+        """ Remove obj_id from the indexes
+        """
+        for by_value, by_id in cls._indexes().values():
+            if obj_id in by_id:
+                value = by_id.pop(obj_id)
+                del by_value[value][obj_id]
+                if not by_value[value]:
+                    del by_value[value]
+
+    @classmethod
+    def reindex(cls):
+        """ Rebuild the indexes from all objects
+        """
+        INDEXES[cls.__name__] = None
+        cls._indexes()
 
     @classmethod
     def count(cls) -> int:
@@ -108,6 +392,23 @@ class Base():
         s_class = cls.__name__
         return len(DATA[s_class].keys())
 
+    @classmethod
+    def page(cls, cursor: str = None,
+             limit: int = 100) -> Tuple[List[TypeVar('Base')], str]:
+        """ Return up to limit objects with an id after cursor, in id
+        order, and the cursor of the next page (None on the last page)
+        """
+        s_class = cls.__name__
+        with LOCK:
+            if ORDERS.get(s_class) is None:
+                ORDERS[s_class] = sorted(DATA[s_class])
+            order = ORDERS[s_class]
+            start = bisect_right(order, cursor) if cursor else 0
+            ids = order[start:start + limit]
+            next_cursor = ids[-1] if start + limit < len(order) else None
+        objs = map(DATA[s_class].get, ids)
+        return [obj for obj in objs if obj is not None], next_cursor
+
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all objects
@@ -135,4 +436,52 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        indexes = cls._indexes()
+        for k, v in attributes.items():
+            if k in indexes:
+                try:
+                    ids = list(indexes[k][0].get(v, {}))
+                except TypeError:
+                    continue
+                candidates = map(DATA[s_class].get, ids)
+                return list(filter(_search, filter(None, candidates)))
+        # a copy: other threads may save or remove objects meanwhile
+        store = DATA[s_class]
+        if isinstance(store, LazyStore):
+            objs = filter(None, map(store.get, list(store)))
+        else:
+            objs = list(store.values())
+        return list(filter(_search, objs))
+
+
+def _add_to_index(by_value: dict, by_id: dict, obj_id: str, value):
+    """ Add obj_id with value to one index; unhashable values are not
+    indexed
+    """
+    try:
+        by_value.setdefault(value, {})[obj_id] = None
+    except TypeError:
+        return
+    by_id[obj_id] = value
+
+
+def _flusher():
+    """ Write-behind thread: flush every FLUSH_INTERVAL seconds, or
+    sooner when FLUSH_THRESHOLD changes are pending
+    """
+    while True:
+        FLUSH_EVENT.wait(FLUSH_INTERVAL)
+        FLUSH_EVENT.clear()
+        Base.flush()
+
+
+def _start_flusher():
+    """ Start the write-behind thread once
+    """
+    global FLUSHER
+    if FLUSHER is None:
+        FLUSHER = threading.Thread(target=_flusher, daemon=True)
+        FLUSHER.start()
+
+
+atexit.register(Base.flush)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+""" Hashers module: password hashing behind models.user.User
+
+Hashes are stored as '<name>$<parameters>$<salt>$<hash>', except the
+legacy unsalted SHA256 hex digests, which have no prefix.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+
+
+class Overloaded(Exception):
+    """ Raised when QUEUE_SIZE slow hashes are already waiting or running
+    """
+
+
+class Hasher(ABC):
+    """ Password hasher interface
+    """
+    name = None
+    # slow hashers run in POOL, see encode() and verify() below
+    slow = False
+
+    @abstractmethod
+    def encode(self, pwd: str) -> str:
+        """ Hash of pwd, tagged with the hasher name
+        """
+
+    @abstractmethod
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Check pwd against encoded, in constant time
+        """
+
+    def needs_update(self, encoded: str) -> bool:
+        """ True if encoded was made with other parameters
+        """
+        return False
+
+
+class SHA256Hasher(Hasher):
+    """ Legacy unsalted SHA256 hex digest
+    """
+    name = 'sha256'
+
+    def encode(self, pwd: str) -> str:
+        """ Hash of pwd
+        """
+        return hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Check pwd against encoded, in constant time
+        """
+        return hmac.compare_digest(self.encode(pwd), encoded)
+
+
+class PBKDF2Hasher(Hasher):
+    """ PBKDF2-HMAC-SHA256: pbkdf2_sha256$<iterations>$<salt>$<hash>
+    """
+    name = 'pbkdf2_sha256'
+    slow = True
+
+    def __init__(self, iterations: int = 260000):
+        """ Initialize a PBKDF2Hasher
+        """
+        self.iterations = iterations
+
+    def _hash(self, pwd: str, salt: str, iterations: int) -> str:
+        """ Hex digest of pwd
+        """
+        return hashlib.pbkdf2_hmac('sha256', pwd.encode(), salt.encode(),
+                                   iterations).hex()
+
+    def encode(self, pwd: str) -> str:
+        """ Hash of pwd, tagged with the hasher name
+        """
+        salt = secrets.token_hex(16)
+        return "{}${}${}${}".format(self.name, self.iterations, salt,
+                                    self._hash(pwd, salt, self.iterations))
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Check pwd against encoded, in constant time
+        """
+        try:
+            _, iterations, salt, digest = encoded.split('$')
+            iterations = int(iterations)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._hash(pwd, salt, iterations), digest)
+
+    def needs_update(self, encoded: str) -> bool:
+        """ True if encoded was made with other iterations
+        """
+        return encoded.split('$')[1] != str(self.iterations)
+
+
+class ScryptHasher(Hasher):
+    """ scrypt: scrypt$<n>$<r>$<p>$<salt>$<hash>
+    """
+    name = 'scrypt'
+    slow = True
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1):
+        """ Initialize a ScryptHasher
+        """
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def _hash(self, pwd: str, salt: str, n: int, r: int, p: int) -> str:
+        """ Hex digest of pwd
+        """
+        return hashlib.scrypt(pwd.encode(), salt=salt.encode(), n=n, r=r,
+                              p=p, maxmem=256 * n * r + 1024 * 1024,
+                              dklen=32).hex()
+
+    def encode(self, pwd: str) -> str:
+        """ Hash of pwd, tagged with the hasher name
+        """
+        salt = secrets.token_hex(16)
+        return "{}${}${}${}${}${}".format(
+            self.name, self.n, self.r, self.p, salt,
+            self._hash(pwd, salt, self.n, self.r, self.p))
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Check pwd against encoded, in constant time
+        """
+        try:
+            _, n, r, p, salt, digest = encoded.split('$')
+            n, r, p = int(n), int(r), int(p)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._hash(pwd, salt, n, r, p), digest)
+
+    def needs_update(self, encoded: str) -> bool:
+        """ True if encoded was made with other costs
+        """
+        return encoded.split('$')[1:4] != [str(self.n), str(self.r),
+                                           str(self.p)]
+
+
+HASHERS = {
+    'sha256': SHA256Hasher(),
+    'pbkdf2_sha256': PBKDF2Hasher(
+        int(getenv('PASSWORD_PBKDF2_ITERATIONS', '260000'))),
+    'scrypt': ScryptHasher(int(getenv('PASSWORD_SCRYPT_N', str(2 ** 14)))),
+}
+# hashing releases the GIL: slow hashers run on at most this many threads
+WORKERS = int(getenv('PASSWORD_WORKERS', str(os.cpu_count() or 1)))
+POOL = ThreadPoolExecutor(WORKERS, thread_name_prefix='password')
+# beyond this many slow hashes waiting or running, new ones fail fast
+QUEUE_SIZE = int(getenv('PASSWORD_QUEUE_SIZE', str(4 * WORKERS)))
+SLOTS = threading.BoundedSemaphore(QUEUE_SIZE)
+
+
+def get_hasher(name: str = None) -> Hasher:
+    """ Hasher called name, by default $PASSWORD_HASHER (sha256)
+    """
+    name = name or getenv('PASSWORD_HASHER', 'sha256')
+    if name not in HASHERS:
+        raise ValueError("unknown password hasher {!r}, expected one of: "
+                         "{}".format(name, ", ".join(sorted(HASHERS))))
+    return HASHERS[name]
+
+
+def identify(encoded: str) -> Hasher:
+    """ Hasher which made encoded
+    """
+    name = encoded.split('$', 1)[0]
+    return HASHERS.get(name, HASHERS['sha256'])
+
+
+def encode(hasher: Hasher, pwd: str) -> str:
+    """ hasher.encode(pwd), in POOL for slow hashers
+    """
+    if not hasher.slow:
+        return hasher.encode(pwd)
+    return _run(hasher.encode, pwd)
+
+
+def verify(pwd: str, encoded: str) -> bool:
+    """ Check pwd against encoded with its hasher, in POOL for slow ones
+    """
+    hasher = identify(encoded)
+    if not hasher.slow:
+        return hasher.verify(pwd, encoded)
+    return _run(hasher.verify, pwd, encoded)
+
+
+def _run(func, *args):
+    """ func(*args) in POOL, unless QUEUE_SIZE calls are already in
+
+    Raises Overloaded rather than queueing without bound.
+    """
+    if not SLOTS.acquire(blocking=False):
+        raise Overloaded
+    try:
+        return POOL.submit(func, *args).result()
+    finally:
+        SLOTS.release()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+""" Tests of models.base
+"""
+import sys
+import threading
+
+import pytest
+
+from models import base
+from models.base import Base
+from models.storage import LazyStore
+
+
+class JournalItem(Base):
+    """ Model stored in journal mode """
+    __storage__ = 'journal'
+    __slots__ = ('name',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a JournalItem """
+        super().__init__(*args, **kwargs)
+        self.name = kwargs.get('name')
+
+
+class LazyItem(Base):
+    """ Model loaded lazily, indexed by name """
+    __lazy__ = True
+    __indexes__ = ('name',)
+    __slots__ = ('name',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a LazyItem """
+        super().__init__(*args, **kwargs)
+        self.name = kwargs.get('name')
+
+
+def restart(cls):
+    """ Forget cls as a new process would, then load it from file """
+    journal = base.JOURNALS.pop(cls.__name__, None)
+    if journal is not None:
+        journal.close()
+    cls.load_from_file()
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    """ Empty stores in a temporary directory """
+    monkeypatch.chdir(tmp_path)
+    for cls in (JournalItem, LazyItem):
+        for table in (base.DATA, base.INDEXES, base.ORDERS):
+            table.pop(cls.__name__, None)
+        journal = base.JOURNALS.pop(cls.__name__, None)
+        if journal is not None:
+            journal.close()
+    yield tmp_path
+    for cls in (JournalItem, LazyItem):
+        journal = base.JOURNALS.pop(cls.__name__, None)
+        if journal is not None:
+            journal.close()
+
+
+def test_journal_mode_replay(store):
+    """ Saves and removes are replayed from the journal """
+    JournalItem.load_from_file()
+    items = [JournalItem(name=str(i)) for i in range(3)]
+    for item in items:
+        item.save()
+    items[1].name = "renamed"
+    items[1].save()
+    items[2].remove()
+    assert not (store / ".db_JournalItem.json").exists()
+
+    restart(JournalItem)
+    assert sorted(i.name for i in JournalItem.all()) == ["0", "renamed"]
+    assert JournalItem.get(items[2].id) is None
+
+
+def test_journal_compaction(store):
+    """ compact() writes a snapshot and drops the journal it replaces """
+    JournalItem.load_from_file()
+    items = [JournalItem(name=str(i)) for i in range(5)]
+    for item in items:
+        item.save()
+    JournalItem.compact()
+    assert (store / ".db_JournalItem.json").exists()
+    assert not (store / ".db_JournalItem.journal").exists()
+    assert not (store / ".db_JournalItem.journal.1").exists()
+
+    items[0].remove()
+    restart(JournalItem)
+    assert sorted(i.name for i in JournalItem.all()) == ["1", "2", "3", "4"]
+
+
+def test_journal_compacted_after_restart(store, monkeypatch):
+    """ Entries replayed on startup count toward the compaction """
+    monkeypatch.setattr(base, "COMPACT_MIN_ENTRIES", 10)
+    JournalItem.load_from_file()
+    for i in range(8):
+        JournalItem(name=str(i)).save()
+
+    restart(JournalItem)
+    assert JournalItem._journal().entries == 8
+    for item in JournalItem.all()[:3]:
+        item.name += "!"
+        item.save()
+    base.COMPACTIONS[JournalItem.__name__].join()
+    assert (store / ".db_JournalItem.json").exists()
+    assert JournalItem._journal().entries == 0
+
+    restart(JournalItem)
+    assert JournalItem.count() == 8
+    assert sum(i.name.endswith("!") for i in JournalItem.all()) == 3
+
+
+def test_lazy_index_without_decoding(store):
+    """ The first search of a lazy model decodes only the results """
+    LazyItem.load_from_file()
+    for i in range(5):
+        LazyItem(name=str(i % 2)).save()
+    restart(LazyItem)
+    lazy = base.DATA[LazyItem.__name__]
+    assert isinstance(lazy, LazyStore)
+
+    assert len(LazyItem.search({'name': '1'})) == 2
+    assert len(lazy._cache) == 2
+
+
+def test_lazy_save_releases_objects(store):
+    """ Objects saved to a lazy store are no longer held in memory once
+    a snapshot including them is written
+    """
+    LazyItem.load_from_file()
+    LazyItem(name="a").save()
+    restart(LazyItem)
+    item = LazyItem(name="b")
+    item.save()
+    lazy = base.DATA[LazyItem.__name__]
+    assert lazy._objs == {}
+    assert LazyItem.get(item.id).name == "b"
+    assert [i.name for i in LazyItem.search({'name': 'b'})] == ["b"]
+
+
+def test_page_order_without_duplicates(store):
+    """ Saves racing with the first page() leave each id once in order """
+    JournalItem.load_from_file()
+    items = [JournalItem(name=str(i)) for i in range(200)]
+    for item in items[:100]:
+        item.save()
+
+    def save(chunk):
+        for item in chunk:
+            item.save()
+            item.save()
+
+    threads = [threading.Thread(target=save, args=(items[i::4],))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    JournalItem.page(limit=10)
+    for thread in threads:
+        thread.join()
+    assert base.ORDERS[JournalItem.__name__] == sorted(i.id for i in items)
+
+
+def test_search_during_saves(store, monkeypatch):
+    """ search() runs over a copy while other threads save and remove """
+    monkeypatch.setattr(base, "COMPACT_MIN_ENTRIES", 10 ** 6)
+    JournalItem.load_from_file()
+    for i in range(2000):
+        base.DATA[JournalItem.__name__][str(i)] = JournalItem(name=str(i))
+    done = threading.Event()
+    errors = []
+
+    def churn():
+        while not done.is_set():
+            item = JournalItem(name="churn")
+            item.save()
+            item.remove()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(50):
+            try:
+                JournalItem.all()
+            except RuntimeError as e:
+                errors.append(e)
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+""" Tests of models.hashers
+"""
+import threading
+
+import pytest
+
+from models import hashers
+
+
+def test_get_hasher_unknown():
+    """ An unknown name is reported with the valid ones """
+    with pytest.raises(ValueError, match="'md5'.*pbkdf2_sha256"):
+        hashers.get_hasher('md5')
+
+
+def test_get_hasher_default(monkeypatch):
+    """ The hasher defaults to $PASSWORD_HASHER """
+    monkeypatch.setenv('PASSWORD_HASHER', 'scrypt')
+    assert hashers.get_hasher().name == 'scrypt'
+    assert hashers.get_hasher('sha256').name == 'sha256'
+
+
+def test_hasher_is_abstract():
+    """ A hasher must implement encode and verify """
+    with pytest.raises(TypeError):
+        hashers.Hasher()
+
+
+@pytest.mark.parametrize("name", sorted(hashers.HASHERS))
+def test_encode_verify(name):
+    """ Each hasher verifies its own hashes, identified by their prefix """
+    hasher = hashers.get_hasher(name)
+    encoded = hashers.encode(hasher, "H0lberton")
+    assert hashers.identify(encoded) is hasher
+    assert hashers.verify("H0lberton", encoded)
+    assert not hashers.verify("h0lberton", encoded)
+
+
+def test_overloaded(monkeypatch):
+    """ Slow hashes fail fast once QUEUE_SIZE are in, fast ones still run """
+    monkeypatch.setattr(hashers, 'SLOTS', threading.BoundedSemaphore(1))
+    slow = hashers.PBKDF2Hasher(1000)
+    encoded = hashers.encode(slow, "H0lberton")
+    hashers.SLOTS.acquire()
+    with pytest.raises(hashers.Overloaded):
+        hashers.encode(slow, "H0lberton")
+    with pytest.raises(hashers.Overloaded):
+        hashers.verify("H0lberton", encoded)
+    fast = hashers.get_hasher('sha256')
+    assert hashers.verify("H0lberton", hashers.encode(fast, "H0lberton"))
+    hashers.SLOTS.release()
+    assert hashers.verify("H0lberton", encoded)
+
+
+def test_slot_released_on_error(monkeypatch):
+    """ A failing hash gives its slot back """
+    monkeypatch.setattr(hashers, 'SLOTS', threading.BoundedSemaphore(1))
+    slow = hashers.PBKDF2Hasher(1000)
+    monkeypatch.setattr(slow, '_hash', lambda *args: 1 / 0)
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            hashers.encode(slow, "H0lberton")
+    assert hashers.SLOTS.acquire(blocking=False)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+""" Tests of models.storage
+"""
+import threading
+
+from models.storage import Journal, LazyStore, read_journal, write_snapshot
+
+
+def test_journal_replay(tmp_path):
+    """ Records come back in order, rotated journal first """
+    journal = Journal(str(tmp_path / "j.journal"))
+    journal.append([{"op": "save", "id": "1", "obj": {"id": "1"}}])
+    journal.rotate()
+    journal.append([{"op": "remove", "id": "1"},
+                    {"op": "save", "id": "2", "obj": {"id": "2"}}])
+    journal.close()
+
+    replayed = Journal(str(tmp_path / "j.journal"))
+    assert [r["id"] for r in replayed.replay()] == ["1", "1", "2"]
+
+
+def test_journal_replay_counts_entries(tmp_path):
+    """ entries is the replayed size, not 0, after a restart """
+    journal = Journal(str(tmp_path / "j.journal"))
+    journal.append([{"op": "remove", "id": str(i)} for i in range(5)])
+    journal.close()
+
+    restarted = Journal(str(tmp_path / "j.journal"))
+    assert restarted.entries == 0
+    list(restarted.replay())
+    assert restarted.entries == 5
+    restarted.append([{"op": "remove", "id": "5"}])
+    assert restarted.entries == 6
+
+
+def test_journal_rotate_appends_to_rotated(tmp_path):
+    """ A rotated journal not yet compacted is kept and appended to """
+    journal = Journal(str(tmp_path / "j.journal"))
+    journal.append([{"op": "remove", "id": "1"}])
+    journal.rotate()
+    journal.append([{"op": "remove", "id": "2"}])
+    rotated_path = journal.rotate()
+    assert [r["id"] for r in read_journal(rotated_path)] == ["1", "2"]
+    assert not (tmp_path / "j.journal").exists()
+
+
+def test_read_journal_ignores_torn_line(tmp_path):
+    """ A last line cut by a crash is ignored """
+    file_path = tmp_path / "j.journal"
+    file_path.write_text('{"op": "remove", "id": "1"}\n{"op": "rem')
+    assert [r["id"] for r in read_journal(str(file_path))] == ["1"]
+
+
+class Obj():
+    """ Object stored in a LazyStore """
+
+    def __init__(self, **kwargs):
+        """ Initialize an Obj """
+        self.__dict__.update(kwargs)
+
+    def to_json(self, for_serialization: bool = False) -> dict:
+        """ JSON of the Obj """
+        return dict(self.__dict__)
+
+
+def lazy_store(tmp_path, objs: dict, cache_size: int = 10000) -> LazyStore:
+    """ LazyStore over a snapshot of objs """
+    file_path = str(tmp_path / "snapshot.json")
+    write_snapshot(file_path, objs.items())
+    return LazyStore(file_path, lambda j: Obj(**j), cache_size)
+
+
+def test_lazy_store_spans(tmp_path):
+    """ Each line of the snapshot is mapped, objects decoded on access """
+    objs = {'a': {'id': 'a', 'n': 1}, 'b"\\': {'id': 'b', 'n': 2}}
+    store = lazy_store(tmp_path, objs)
+    assert set(store.spans) == set(objs)
+    assert len(store) == 2
+    assert store['b"\\'].n == 2
+    assert 'c' not in store
+
+
+def test_lazy_store_cache_eviction(tmp_path):
+    """ Only the cache_size most recently used objects stay decoded """
+    store = lazy_store(tmp_path, {str(i): {'n': i} for i in range(5)}, 2)
+    for obj_id in ('0', '1', '0', '2'):
+        store[obj_id]
+    assert list(store._cache) == ['0', '2']
+    assert store['1'].n == 1
+
+
+def test_lazy_store_scan(tmp_path):
+    """ Values of a key are read without decoding the objects """
+    store = lazy_store(tmp_path, {
+        'a': {'email': 'a@x.io', 'n': 1},
+        'b': {'email': 'b\\"@x.io', 'note': '"email": "no"'},
+        'c': {'n': 3, 'email': None},
+    })
+    store['d'] = Obj(email='d@x.io')
+    del store['a']
+    assert sorted(store.scan('email'), key=str) == sorted(
+        [('b', 'b\\"@x.io'), ('c', None), ('d', 'd@x.io')], key=str)
+    assert not store._cache
+
+
+def test_lazy_store_snapshot_round_trip(tmp_path):
+    """ Once a snapshot is written, remap() drops the objects it holds
+    in memory; changes made meanwhile are kept
+    """
+    store = lazy_store(tmp_path, {'a': {'n': 1}, 'b': {'n': 2}})
+    store['c'] = Obj(n=3)
+    del store['b']
+    items, change = store.snapshot()
+    store['d'] = Obj(n=4)
+    file_path = str(tmp_path / "next.json")
+    write_snapshot(file_path, items)
+    store.remap(file_path, change)
+
+    assert set(store._objs) == {'d'}
+    assert sorted(store) == ['a', 'c', 'd']
+    assert store['c'].n == 3
+    reloaded = LazyStore(file_path, lambda j: Obj(**j))
+    assert sorted(reloaded) == ['a', 'c']
+
+
+def test_lazy_store_concurrent_access(tmp_path):
+    """ Reads racing on a small cache neither fail nor miss """
+    store = lazy_store(tmp_path, {str(i): {'n': i} for i in range(200)}, 8)
+    errors = []
+
+    def read():
+        try:
+            for _ in range(20):
+                for i in range(200):
+                    assert store[str(i)].n == i
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(store._cache) <= 8
+
+
+def test_append_after_torn_line(tmp_path):
+    """ Records appended after a replay cut a torn line are kept """
+    file_path = tmp_path / "j.journal"
+    file_path.write_text('{"op": "remove", "id": "1"}\n{"op": "rem')
+    journal = Journal(str(file_path))
+    assert [r["id"] for r in journal.replay()] == ["1"]
+    journal.append([{"op": "remove", "id": "2"}])
+    journal.append([{"op": "remove", "id": "3"}])
+    journal.close()
+
+    restarted = Journal(str(file_path))
+    assert [r["id"] for r in restarted.replay()] == ["1", "2", "3"]
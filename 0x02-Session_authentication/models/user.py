@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """ User module
 """
-import hashlib
+from models import hashers
 from models.base import Base
 
 
 class User(Base):
     """ User class
     """
+    __indexes__ = ('email',)
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    # hasher of new passwords; others are upgraded on successful login
+    hasher = hashers.get_hasher()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
@@ -26,22 +30,32 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: hash it with User.hasher
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hashers.encode(self.hasher, pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
-        """ Validate a password
+        """ Validate a password, upgrading its hash to User.hasher
         """
         if pwd is None or type(pwd) is not str:
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        if not hashers.verify(pwd, self.password):
+            return False
+        if hashers.identify(self.password).name != self.hasher.name or \
+                self.hasher.needs_update(self.password):
+            try:
+                self.password = pwd
+            except hashers.Overloaded:
+                # the hash is upgraded at a later, quieter login
+                return True
+            if self.__class__.get(self.id) is not None:
+                self.save()
+        return True
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
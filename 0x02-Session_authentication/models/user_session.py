@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+""" UserSession module
+"""
+from models.base import Base
+
+
+class UserSession(Base):
+    """ UserSession class: a session of SessionDBAuth, whose id is the
+    session id
+    """
+    __slots__ = ('user_id',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a UserSession instance
+        """
+        super().__init__(*args, **kwargs)
+        self.user_id = kwargs.get('user_id')
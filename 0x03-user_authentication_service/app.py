@@ -3,13 +3,33 @@
 Basic Flask app
 """
 from flask import Flask, abort, jsonify, make_response, redirect, request
-from auth import Auth
+from auth import Auth, HASHING, HASH_METRICS
+from hashing import Overloaded
 
 
 app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error):
+    response = jsonify({"message": "service overloaded"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    AUTH._db.remove_session()
+
+
+@app.route('/metrics/hashing', methods=['GET'])
+def hashing_metrics():
+    if not HASH_METRICS:
+        abort(404)
+    return jsonify(HASHING.metrics())
+
+
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({"message": "Bienvenue"})
@@ -49,6 +69,8 @@ def login():
         response.set_cookie("session_id", session_id)
 
         return response, 200
+    except Overloaded:
+        raise
     except Exception as e:
         abort(401)
 
@@ -61,7 +83,7 @@ def logout():
         user = AUTH.get_user_from_session_id(session_id)
 
         if user:
-            AUTH.destroy_session(user.id)
+            AUTH.destroy_session(user.id, session_id)
             response = redirect('/')
             response.delete_cookie('session_id')
             return response, 302
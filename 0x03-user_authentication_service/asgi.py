@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point of the authentication service, with the routes of app.py
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Handlers are coroutines, so idle connections cost no thread. bcrypt runs
+on the HashingService pool and every DB access on a single dedicated
+thread, which owns its own SQLAlchemy session; the event loop never
+blocks on either.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl
+
+from auth import Auth, HASHING, HASH_METRICS
+from hashing import Overloaded
+
+
+DB_THREAD = ThreadPoolExecutor(1, thread_name_prefix='db')
+AUTH = Auth(db_executor=DB_THREAD)
+MAX_BODY_SIZE = 64 * 1024
+
+Response = Tuple[int, Dict, List[Tuple[bytes, bytes]]]
+
+
+class HTTPError(Exception):
+    """Raised by handlers to answer with an error status
+    """
+
+    def __init__(self, status: int) -> None:
+        """Initialize a new HTTPError
+        """
+        super().__init__(status)
+        self.status = status
+
+
+def json_response(body: Dict, status: int = 200,
+                  headers: List[Tuple[bytes, bytes]] = None) -> Response:
+    """Response with a JSON body
+    """
+    return status, body, headers or []
+
+
+def set_cookie(name: str, value: str) -> Tuple[bytes, bytes]:
+    """Set-Cookie header, as written by Flask
+    """
+    return b"set-cookie", "{}={}; Path=/".format(name, value).encode()
+
+
+def delete_cookie(name: str) -> Tuple[bytes, bytes]:
+    """Set-Cookie header expiring a cookie, as written by Flask
+    """
+    return b"set-cookie", (
+        "{}=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Max-Age=0; Path=/"
+        .format(name).encode())
+
+
+def _session_user(session_id: str) -> Tuple[int, str]:
+    """(id, email) of the user of a session, None if there is none, on
+    the DB thread
+    """
+    user = AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return None
+    return user.id, user.email
+
+
+async def index(form: Dict, cookies: Dict) -> Response:
+    """GET /
+    """
+    return json_response({"message": "Bienvenue"})
+
+
+async def hashing_metrics(form: Dict, cookies: Dict) -> Response:
+    """GET /metrics/hashing, if $HASH_METRICS is set
+    """
+    if not HASH_METRICS:
+        raise HTTPError(404)
+    return json_response(HASHING.metrics())
+
+
+async def users(form: Dict, cookies: Dict) -> Response:
+    """POST /users
+    """
+    email, password = form.get('email'), form.get('password')
+    try:
+        await AUTH.register_user_async(email, password)
+    except ValueError:
+        return json_response({"message": "email already registered"}, 400)
+    return json_response({"email": email, "message": "user created"})
+
+
+async def login(form: Dict, cookies: Dict) -> Response:
+    """POST /sessions
+    """
+    email, password = form.get('email'), form.get('password')
+    if not await AUTH.valid_login_async(email, password):
+        raise HTTPError(401)
+    session_id = await AUTH.in_db(AUTH.create_session, email)
+    if session_id is None:
+        raise HTTPError(401)
+    return json_response({"email": email, "message": "logged in"},
+                         headers=[set_cookie("session_id", session_id)])
+
+
+async def logout(form: Dict, cookies: Dict) -> Response:
+    """DELETE /sessions
+    """
+    session_id = cookies.get('session_id')
+    user = await AUTH.in_db(_session_user, session_id)
+    if user is None:
+        raise HTTPError(403)
+    await AUTH.in_db(AUTH.destroy_session, user[0], session_id)
+    return 302, None, [(b"location", b"/"), delete_cookie("session_id")]
+
+
+async def profile(form: Dict, cookies: Dict) -> Response:
+    """GET /profile
+    """
+    user = await AUTH.in_db(_session_user, cookies.get('session_id'))
+    if user is None:
+        raise HTTPError(403)
+    return json_response({"email": user[1]})
+
+
+async def reset_password(form: Dict, cookies: Dict) -> Response:
+    """POST /reset_password
+    """
+    email = form.get('email')
+    try:
+        reset_token = await AUTH.in_db(AUTH.get_reset_password_token,
+                                       email)
+    except ValueError:
+        raise HTTPError(403)
+    return json_response({"email": email, "reset_token": reset_token})
+
+
+async def update_password(form: Dict, cookies: Dict) -> Response:
+    """PUT /reset_password
+    """
+    email = form.get('email')
+    try:
+        await AUTH.update_password_async(form.get('reset_token'),
+                                         form.get('new_password'))
+    except ValueError:
+        raise HTTPError(403)
+    return json_response({"email": email, "message": "Password updated"})
+
+
+ROUTES = {
+    ('/', 'GET'): index,
+    ('/metrics/hashing', 'GET'): hashing_metrics,
+    ('/users', 'POST'): users,
+    ('/sessions', 'POST'): login,
+    ('/sessions', 'DELETE'): logout,
+    ('/profile', 'GET'): profile,
+    ('/reset_password', 'POST'): reset_password,
+    ('/reset_password', 'PUT'): update_password,
+}
+PATHS = {path for path, _ in ROUTES}
+
+
+async def read_body(receive: Callable) -> bytes:
+    """Body of the request, up to MAX_BODY_SIZE bytes
+    """
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise HTTPError(400)
+        chunks.append(message.get('body', b''))
+        size += len(chunks[-1])
+        if size > MAX_BODY_SIZE:
+            raise HTTPError(413)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def parse_request(scope: Dict, body: bytes) -> Tuple[Dict, Dict]:
+    """(form, cookies) of a request
+    """
+    form, cookies = {}, {}
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            cookie = SimpleCookie()
+            cookie.load(value.decode('latin-1'))
+            cookies.update((key, morsel.value)
+                           for key, morsel in cookie.items())
+        elif name == b'content-type' and value.startswith(
+                b'application/x-www-form-urlencoded'):
+            form = dict(parse_qsl(body.decode('utf-8', 'replace')))
+    return form, cookies
+
+
+async def send_response(send: Callable, status: int, body,
+                        headers: List[Tuple[bytes, bytes]]) -> None:
+    """Send a response, body being JSON data, text or None
+    """
+    if body is None:
+        content, content_type = b"", b"text/html; charset=utf-8"
+    elif isinstance(body, str):
+        content, content_type = body.encode(), b"text/plain; charset=utf-8"
+    else:
+        content = (json.dumps(body) + "\n").encode()
+        content_type = b"application/json"
+    headers = headers + [(b"content-type", content_type),
+                         (b"content-length", str(len(content)).encode())]
+    await send({"type": "http.response.start", "status": status,
+                "headers": headers})
+    await send({"type": "http.response.body", "body": content})
+
+
+async def app(scope: Dict, receive: Callable, send: Callable) -> None:
+    """ASGI application
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": "lifespan.startup.complete"})
+            elif message['type'] == 'lifespan.shutdown':
+                DB_THREAD.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path']
+    path = path.rstrip('/') or '/'
+    handler = ROUTES.get((path, scope['method']))
+    if handler is None:
+        status = 405 if path in PATHS else 404
+        await send_response(send, status, "", [])
+        return
+    try:
+        form, cookies = parse_request(scope, await read_body(receive))
+        status, body, headers = await handler(form, cookies)
+    except HTTPError as error:
+        status, body, headers = error.status, "", []
+    except Overloaded:
+        status, body = 503, {"message": "service overloaded"}
+        headers = [(b"retry-after", b"1")]
+    await send_response(send, status, body, headers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 """defines the password hash function
 """
-import bcrypt
+import asyncio
+import os
 import uuid
+from concurrent.futures import Executor
 from db import DB
-from typing import Union
+from hashing import HashingService
+from sessions import SessionStore, get_session_store
+from typing import Callable, Union
 from user import User
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
 
+HASHING = HashingService()
+# GET /metrics/hashing is served only when $HASH_METRICS is set
+HASH_METRICS = os.getenv('HASH_METRICS', '') not in ('', '0')
+
+
 def _generate_uuid():
     """
     Generate a new UUID and return its string representation.
@@ -28,10 +38,12 @@ def _hash_password(password: str) -> bytes:
 
     Returns:
         bytes: Salted hash of the input password.
+
+    Raises:
+        Overloaded: If the hashing service queue is full.
     """
     if password and isinstance(password, str):
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+        hashed_password = HASHING.hashpw(password.encode('utf-8'))
         return hashed_password
 
 
@@ -39,8 +51,85 @@ class Auth:
     """Auth class to interact with the authentication database.
     """
 
-    def __init__(self):
+    def __init__(self, session_store: SessionStore = None,
+                 db_executor: Executor = None):
+        """
+        Initialize a new Auth.
+
+        Args:
+            session_store (SessionStore): Where sessions are kept, by
+            default the store named by $SESSION_STORE.
+            db_executor (Executor): Where the *_async methods run their
+            DB work, by default the event loop's default executor.
+        """
         self._db = DB()
+        self._sessions = session_store or get_session_store(self._db)
+        self._db_executor = db_executor
+
+    async def in_db(self, func: Callable, *args):
+        """
+        Run func(*args) on db_executor and return its result, which must
+        not hold ORM objects: the thread session is closed after each
+        call.
+        """
+        def run():
+            try:
+                return func(*args)
+            finally:
+                self._db.remove_session()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, run)
+
+    def _hashed_password(self, email: str) -> bytes:
+        """
+        Password hash of the user of email, None if there is none.
+        """
+        try:
+            return self._db.find_user_by(email=email).hashed_password
+        except NoResultFound:
+            return None
+
+    def _add_user(self, email: str, hashed_password: bytes) -> User:
+        """
+        Add a user.
+
+        Raises:
+            ValueError: If the email was registered meanwhile; other
+            integrity errors are raised as is.
+        """
+        try:
+            return self._db.add_user(email, hashed_password)
+        except IntegrityError as error:
+            self._db._session.rollback()
+            if self._hashed_password(email) is None:
+                raise error
+            raise ValueError(f"User {email} already exists.")
+
+    def _reset_token_user(self, reset_token: str) -> int:
+        """
+        Id of the user of a reset token.
+
+        Raises:
+            ValueError: If no user has this reset token.
+        """
+        try:
+            return self._db.find_user_by(reset_token=reset_token).id
+        except NoResultFound:
+            raise ValueError
+
+    def _set_password(self, reset_token: str,
+                      hashed_password: bytes) -> None:
+        """
+        Set the password of the user of a reset token and clear the
+        token.
+
+        Raises:
+            ValueError: If no user has this reset token.
+        """
+        user_id = self._reset_token_user(reset_token)
+        self._db.update_user(user_id, hashed_password=hashed_password,
+                             reset_token=None)
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -61,10 +150,26 @@ class Auth:
             raise ValueError(f"User {email} already exists.")
         except NoResultFound:
             hashed_password = _hash_password(password)
-            user = self._db.add_user(email, hashed_password)
+            user = self._add_user(email, hashed_password)
 
         return user
 
+    async def register_user_async(self, email: str, password: str) -> None:
+        """
+        register_user for coroutines: DB work runs on db_executor and
+        bcrypt on the hashing service, never on the event loop.
+
+        Raises:
+            ValueError: If a user with the same email already exists.
+        """
+        if await self.in_db(self._hashed_password, email) is not None:
+            raise ValueError(f"User {email} already exists.")
+        hashed_password = None
+        if password and isinstance(password, str):
+            hashed_password = await HASHING.hashpw_async(
+                password.encode('utf-8'))
+        await self.in_db(self._add_user, email, hashed_password)
+
     def valid_login(self, email: str, password: str) -> bool:
         """
         Validate user login.
@@ -75,6 +180,9 @@ class Auth:
 
         Returns:
             bool: True if login is valid, False otherwise.
+
+        Raises:
+            Overloaded: If the hashing service queue is full.
         """
         try:
             user = self._db.find_user_by(email=email)
@@ -83,7 +191,20 @@ class Auth:
 
         hashed_password = user.hashed_password
 
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+        return HASHING.checkpw(password.encode('utf-8'), hashed_password)
+
+    async def valid_login_async(self, email: str, password: str) -> bool:
+        """
+        valid_login for coroutines.
+
+        Raises:
+            Overloaded: If the hashing service queue is full.
+        """
+        hashed_password = await self.in_db(self._hashed_password, email)
+        if hashed_password is None or not isinstance(password, str):
+            return False
+        return await HASHING.checkpw_async(password.encode('utf-8'),
+                                           hashed_password)
 
     def create_session(self, email: str) -> str:
         """
@@ -97,12 +218,7 @@ class Auth:
         """
         try:
             user = self._db.find_user_by(email=email)
-
-            session_id = _generate_uuid()
-            user.session_id = session_id
-            self._db._session.commit()
-
-            return session_id
+            return self._sessions.create(user.id, user.email)
         except Exception:
             pass
 
@@ -110,25 +226,9 @@ class Auth:
         """
         Get the corresponding User based on the session ID.
 
-        Args:
-            session_id (str): The session ID to look up.
-
-        Returns:
-            User or None: The corresponding User object if found,
-            otherwise None.
-        """
-        if session_id is None:
-            return None
-
-        try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user
-        except NoResultFound:
-            return None
-
-    def get_user_from_session_id(self, session_id: str):
-        """
-        Get the corresponding User based on the session ID.
+        The session store answers alone: the DB store with one query by
+        session_id, the memory and file stores with the id and email kept
+        in the session, without any query.
 
         Args:
             session_id (str): The session ID to look up.
@@ -140,26 +240,25 @@ class Auth:
         if session_id is None:
             return None
 
-        try:
-            user = self._db.find_user_by(session_id=session_id)
-            return user
-        except NoResultFound:
-            return None
+        return self._sessions.user(session_id)
 
-    def destroy_session(self, user_id: int):
+    def destroy_session(self, user_id: int, session_id: str = None):
         """
-        Destroy the session of the corresponding user.
+        Destroy a session of the corresponding user.
 
         Args:
             user_id (int): The user ID whose session needs to be destroyed.
+            session_id (str): The session to end, the one being logged
+            out; if None every session of the user is ended.
 
         Returns:
             None
         """
         try:
-            user = self._db.find_user_by(id=user_id)
-            user.session_id = None
-            self._db._session.commit()
+            if session_id is not None:
+                self._sessions.destroy(session_id)
+            else:
+                self._sessions.destroy_user(user_id)
         except NoResultFound:
             pass
 
@@ -203,3 +302,19 @@ class Auth:
         user.hashed_password = hashed_password
         user.reset_token = None
         self._db._session.commit()
+
+    async def update_password_async(self, reset_token: str,
+                                    password: str) -> None:
+        """
+        update_password for coroutines. The token is looked up again
+        after hashing: it may have been used meanwhile.
+
+        Raises:
+            ValueError: If no user has this reset token.
+        """
+        await self.in_db(self._reset_token_user, reset_token)
+        hashed_password = None
+        if password and isinstance(password, str):
+            hashed_password = await HASHING.hashpw_async(
+                password.encode('utf-8'))
+        await self.in_db(self._set_password, reset_token, hashed_password)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Load test of app.py, in process (Flask test client) and over a local
+socket, reported as JSON
+
+    ./benchmark_app.py [-u users] [-n requests] [-m hash-requests]
+                       [-c concurrency] [-t client,socket]
+                       [-s scenario,...] [-o out.json]
+
+The app runs on a temporary database of --users users. Each scenario
+sends --requests requests, or --hash-requests for the ones running
+bcrypt, from --concurrency threads; throughput and p50/p95/p99 latency
+are reported per scenario and transport.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+
+PASSWORD = "H0lbertonSchool98!"
+AUTH_USERS = 100
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+class ClientTransport:
+    """Requests through the Flask test client
+    """
+
+    def __init__(self, app) -> None:
+        """Initialize a new ClientTransport
+        """
+        # cookies are sent explicitly, as over the socket
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, headers: Dict = None,
+                body: bytes = None) -> Tuple[int, bytes]:
+        """(status, body) of a request
+        """
+        response = self.client.open(path, method=method,
+                                    headers=headers or {}, data=body)
+        return response.status_code, response.get_data()
+
+
+class SocketTransport:
+    """Requests over HTTP to a local server
+    """
+
+    def __init__(self, address: Tuple[str, int]) -> None:
+        """Initialize a new SocketTransport
+        """
+        self.connection = http.client.HTTPConnection(*address)
+
+    def request(self, method: str, path: str, headers: Dict = None,
+                body: bytes = None) -> Tuple[int, bytes]:
+        """(status, body) of a request
+        """
+        self.connection.request(method, path, body=body,
+                                headers=headers or {})
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.will_close:
+            self.connection.close()
+        return response.status, data
+
+
+def start_server(app) -> Tuple[str, int]:
+    """Serve app on a free local port from a thread, return its address
+    """
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    """q-th quantile of sorted latencies, in ms
+    """
+    if not latencies:
+        return 0.0
+    return latencies[int(round(q * (len(latencies) - 1)))] * 1e3
+
+
+def run(step: Callable, expected: Tuple[int, ...], transport: Callable,
+        requests: int, concurrency: int) -> Dict:
+    """Call step(transport, i) for i in range(requests) from concurrency
+    threads, each with its own transport, and return the statistics
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i: int) -> None:
+        if not hasattr(local, "transport"):
+            local.transport = transport()
+        start = time.perf_counter()
+        try:
+            status = step(local.transport, i)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status not in expected:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors[0],
+        "seconds": round(elapsed, 4),
+        "throughput": round(requests / (elapsed or 1), 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def populate(db, count: int) -> None:
+    """Add count users sharing PASSWORD, hashed once
+    """
+    import bcrypt
+    hashed_password = bcrypt.hashpw(PASSWORD.encode("utf-8"),
+                                    bcrypt.gensalt())
+    db.add_users_bulk({"email": "user{}@hbtn.io".format(i),
+                       "hashed_password": hashed_password}
+                      for i in range(count))
+
+
+def scenarios(auth, users: int) -> Dict:
+    """name -> (step, expected statuses, runs bcrypt)
+
+    profile, login and reset_password each use their own users, so that
+    a login never replaces a session used by profile.
+    """
+    auth_users = max(1, min(AUTH_USERS, users // 3))
+    run_id = str(time.time_ns())
+    cookies = ["session_id={}".format(
+        auth.create_session("user{}@hbtn.io".format(i)))
+        for i in range(auth_users)]
+
+    def email(i: int, group: int) -> str:
+        return "user{}@hbtn.io".format(group * auth_users + i % auth_users)
+
+    def index(transport, i):
+        return transport.request("GET", "/")[0]
+
+    def register(transport, i):
+        body = urlencode({"email": "bench-{}-{}@hbtn.io".format(run_id, i),
+                          "password": PASSWORD})
+        return transport.request("POST", "/users", FORM, body.encode())[0]
+
+    def login(transport, i):
+        body = urlencode({"email": email(i, 1), "password": PASSWORD})
+        return transport.request("POST", "/sessions", FORM,
+                                 body.encode())[0]
+
+    def profile(transport, i):
+        return transport.request("GET", "/profile",
+                                 {"Cookie": cookies[i % auth_users]})[0]
+
+    def reset_token(transport, i):
+        body = urlencode({"email": email(i, 2)})
+        return transport.request("POST", "/reset_password", FORM,
+                                 body.encode())[0]
+
+    def reset_password(transport, i):
+        code, data = transport.request(
+            "POST", "/reset_password", FORM,
+            urlencode({"email": email(i, 2)}).encode())
+        if code != 200:
+            return code
+        body = urlencode({"email": email(i, 2),
+                          "reset_token": json.loads(data)["reset_token"],
+                          "new_password": PASSWORD})
+        return transport.request("PUT", "/reset_password", FORM,
+                                 body.encode())[0]
+
+    return {
+        "index": (index, (200,), False),
+        "register": (register, (200,), True),
+        "login": (login, (200,), True),
+        "profile": (profile, (200,), False),
+        "reset_token": (reset_token, (200,), False),
+        "reset_password": (reset_password, (200,), True),
+    }
+
+
+def main() -> None:
+    """Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-u", "--users", type=int, default=1000,
+                        help="users in the table")
+    parser.add_argument("-n", "--requests", type=int, default=500,
+                        help="requests per scenario")
+    parser.add_argument("-m", "--hash-requests", type=int, default=20,
+                        help="requests per scenario running bcrypt")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-t", "--transports", default="client,socket")
+    parser.add_argument("-s", "--scenarios", default=None,
+                        help="comma separated scenarios, by default all")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSON report file, - for stdout")
+    args = parser.parse_args()
+
+    output = args.output
+    if output != "-":
+        output = os.path.abspath(output)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp())
+    os.environ["DB_URL"] = "sqlite:///bench.db"
+
+    import app as auth_app
+    populate(auth_app.AUTH._db, args.users)
+
+    address = None
+    transports = {}
+    for name in args.transports.split(","):
+        if name == "client":
+            transports[name] = lambda: ClientTransport(auth_app.app)
+        elif name == "socket":
+            address = address or start_server(auth_app.app)
+            transports[name] = lambda: SocketTransport(address)
+        else:
+            parser.error("unknown transport {}".format(name))
+
+    results = []
+    for transport_name, transport in transports.items():
+        steps = scenarios(auth_app.AUTH, args.users)
+        names = args.scenarios.split(",") if args.scenarios else list(steps)
+        for name in names:
+            if name not in steps:
+                parser.error("unknown scenario {}".format(name))
+            step, expected, hashes = steps[name]
+            requests = args.hash_requests if hashes else args.requests
+            result = run(step, expected, transport, requests,
+                         args.concurrency)
+            result.update(scenario=name, transport=transport_name)
+            results.append(result)
+            print("{:<14} {:<7} {:10.1f} req/s  p50 {:8.3f} ms  "
+                  "p99 {:8.3f} ms  {} errors".format(
+                      name, transport_name, result["throughput"],
+                      result["p50_ms"], result["p99_ms"], result["errors"]),
+                  file=sys.stderr)
+
+    report = {
+        "app": os.path.basename(os.path.dirname(os.path.abspath(__file__))),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "hash_requests": args.hash_requests,
+        "session_store": os.getenv("SESSION_STORE", "db"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    if output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
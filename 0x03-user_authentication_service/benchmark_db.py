@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Lookup latency on the users table without and with its indexes
+
+    ./benchmark_db.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from user import Base, User
+
+
+def bench_lookups(rows: int = 1000000, lookups: int = 200) -> None:
+    """Time find_user_by-style queries on email, session_id and
+    reset_token before and after creating the indexes.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine("sqlite:///{}".format(path))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for index in User.__table__.indexes:
+            conn.execute(text("DROP INDEX {}".format(index.name)))
+        conn.execute(User.__table__.insert(), [
+            {"email": "user{}@hbtn.io".format(i), "hashed_password": "x",
+             "session_id": "session-{}".format(i),
+             "reset_token": "token-{}".format(i)}
+            for i in range(rows)])
+
+    rand = random.Random(0)
+    keys = [rand.randrange(rows) for _ in range(lookups)]
+    queries = [("email", "user{}@hbtn.io"), ("session_id", "session-{}"),
+               ("reset_token", "token-{}")]
+
+    print("users table, {} rows, {} lookups".format(rows, lookups))
+    for label in ("without indexes", "with indexes"):
+        if label == "with indexes":
+            for index in User.__table__.indexes:
+                index.create(engine)
+        with engine.connect() as conn:
+            for column, value in queries:
+                query = text("SELECT id FROM users WHERE {} = :v"
+                             .format(column))
+                start = time.perf_counter()
+                for key in keys:
+                    conn.execute(query, {"v": value.format(key)}).one()
+                elapsed = (time.perf_counter() - start) / lookups
+                print("  {:<16} {:<12} {:10.3f} ms".format(
+                    label, column, elapsed * 1e3))
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    bench_lookups(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -1,37 +1,184 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import (Column, Integer, Table, create_engine, event, func,
+                        select)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import (IntegrityError, InvalidRequestError,
+                            OperationalError)
 from sqlalchemy.orm.exc import NoResultFound
-from typing import Dict
+from sqlalchemy.pool import QueuePool, StaticPool
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from user import Base, User
 
+# Bump when the tables or indexes in user.py change
+SCHEMA_VERSION = 2
+BATCH_SIZE = 5000
+schema_version = Table('schema_version', Base.metadata,
+                       Column('version', Integer, nullable=False))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use WAL journaling, so readers don't block the writer, and only
+    sync at checkpoints.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 
 class DB:
     """DB class
     """
 
-    def __init__(self) -> None:
+    def __init__(self, url: str = None, echo: bool = None,
+                 pool_size: int = None, reset: bool = None) -> None:
         """Initialize a new DB instance
+
+        Existing tables and rows are kept unless reset is set; see
+        setup_schema.
+
+        Args:
+            url (str): Database URL, by default $DB_URL or sqlite:///a.db.
+            echo (bool): Log SQL statements, by default $DB_ECHO or off.
+            pool_size (int): Pooled connections, by default $DB_POOL_SIZE
+            or 5. In-memory SQLite shares a single connection.
+            reset (bool): Drop all tables first, by default if $DB_RESET
+            is set.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=True)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        url = url or os.getenv('DB_URL', 'sqlite:///a.db')
+        if echo is None:
+            echo = os.getenv('DB_ECHO', '') not in ('', '0')
+        pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '5'))
+        if reset is None:
+            reset = os.getenv('DB_RESET', '') not in ('', '0')
+
+        options = {}
+        if url.startswith('sqlite'):
+            options['connect_args'] = {'check_same_thread': False}
+            if url in ('sqlite://', 'sqlite:///:memory:'):
+                options['poolclass'] = StaticPool
+            else:
+                options['poolclass'] = QueuePool
+                options['pool_size'] = pool_size
+        else:
+            options['pool_size'] = pool_size
+        self._engine = create_engine(url, echo=echo, **options)
+        if url.startswith('sqlite'):
+            event.listen(self._engine, 'connect', _set_sqlite_pragmas)
+
+        self.setup_schema(reset)
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def setup_schema(self, reset: bool = False) -> None:
+        """Bring the schema to SCHEMA_VERSION.
+
+        When the stored version is current this is a single query.
+        Otherwise missing tables and indexes are created and the version
+        is recorded; nothing is dropped unless reset is set. A worker
+        racing another one through the same steps retries once.
+
+        Args:
+            reset (bool): Drop all tables first.
+
+        Raises:
+            ValueError: If existing rows break a unique index to create,
+            e.g. two users with the same email. Nothing is changed then.
+        """
+        if reset:
+            Base.metadata.drop_all(self._engine)
+        for attempt in range(2):
+            try:
+                with self._engine.begin() as conn:
+                    if self.get_schema_version(conn) == SCHEMA_VERSION:
+                        return
+                    duplicates = self.find_duplicates(conn)
+                    if duplicates:
+                        raise ValueError(
+                            "cannot upgrade the schema, rows break unique "
+                            "indexes: {}".format(duplicates))
+                    Base.metadata.create_all(conn)
+                    self.create_indexes(conn)
+                    conn.execute(schema_version.delete())
+                    conn.execute(schema_version.insert(),
+                                 {"version": SCHEMA_VERSION})
+                return
+            except OperationalError:
+                if attempt:
+                    raise
+
+    def get_schema_version(self, conn=None) -> int:
+        """Stored schema version, 0 if there is none.
+        """
+        if conn is None:
+            with self._engine.connect() as conn:
+                return self.get_schema_version(conn)
+        if not self._engine.dialect.has_table(conn, schema_version.name):
+            return 0
+        version = conn.execute(schema_version.select()).scalar()
+        return version or 0
+
+    def find_duplicates(self, conn=None,
+                        limit: int = 10) -> Dict[str, List[Tuple[Any]]]:
+        """Values repeated in the columns of each unique index, as in
+        databases created before the index was declared.
+
+        Args:
+            limit (int): Values reported per index.
+
+        Returns:
+            Dict: Up to limit repeated values per index name, for the
+            indexes which have some.
+        """
+        if conn is None:
+            with self._engine.connect() as conn:
+                return self.find_duplicates(conn, limit)
+        duplicates = {}
+        for table in Base.metadata.sorted_tables:
+            if not self._engine.dialect.has_table(conn, table.name):
+                continue
+            for index in table.indexes:
+                if not index.unique:
+                    continue
+                columns = list(index.columns)
+                query = select(*columns) \
+                    .where(*(column.isnot(None) for column in columns)) \
+                    .group_by(*columns).having(func.count() > 1) \
+                    .limit(limit)
+                rows = conn.execute(query).fetchall()
+                if rows:
+                    duplicates[index.name] = [tuple(row) for row in rows]
+        return duplicates
+
+    def create_indexes(self, conn=None) -> None:
+        """Create the indexes declared on the tables which are missing,
+        as in databases created before they were declared.
+
+        Raises:
+            IntegrityError: If existing rows break a unique index,
+            e.g. two users with the same email.
+        """
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn or self._engine, checkfirst=True)
+
+    def remove_session(self) -> None:
+        """Close the session of the current thread, returning its
+        connection to the pool
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Add a new user to the database.
@@ -52,6 +199,91 @@ class DB:
 
         return new_user
 
+    def add_users_bulk(self, users: Iterable[Dict],
+                       batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+        """Insert users in batches of batch_size rows, one executemany
+        and one transaction per batch, without building User objects.
+
+        Emails already taken are skipped through the unique index rather
+        than looked up first: SQLite ignores them with INSERT OR IGNORE,
+        other databases retry a failing batch one row at a time.
+
+        Args:
+            users: Dicts with email and hashed_password, read lazily.
+            batch_size (int): Rows per transaction.
+
+        Returns:
+            Tuple[int, int]: Number of users inserted and skipped.
+        """
+        table = User.__table__
+        sqlite = self._engine.dialect.name == 'sqlite'
+        insert = table.insert().prefix_with('OR IGNORE') if sqlite \
+            else table.insert()
+        users = iter(users)
+        inserted = skipped = 0
+        while True:
+            batch = [{"email": user["email"],
+                      "hashed_password": user["hashed_password"]}
+                     for user in islice(users, batch_size)]
+            if not batch:
+                return inserted, skipped
+            count = self._insert_batch(insert, batch, sqlite)
+            inserted += count
+            skipped += len(batch) - count
+
+    def _insert_batch(self, insert, batch: List[Dict], sqlite: bool) -> int:
+        """Insert one batch of rows, returning how many were inserted.
+        """
+        try:
+            with self._engine.begin() as conn:
+                result = conn.execute(insert, batch)
+                return result.rowcount if sqlite else len(batch)
+        except IntegrityError:
+            if sqlite:
+                raise
+        count = 0
+        with self._engine.begin() as conn:
+            for row in batch:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert, row)
+                    count += 1
+                except IntegrityError:
+                    pass
+        return count
+
+    def iter_users(self, batch_size: int = BATCH_SIZE,
+                   columns: Iterable[str] = None) -> Iterator[Dict]:
+        """Yield every user as a dict of its columns, in id order.
+
+        Users are read batch_size rows at a time, each query starting
+        after the last id seen, so memory stays constant and no query
+        has to skip over the rows already read.
+
+        Args:
+            batch_size (int): Rows per query.
+            columns: Names of the columns to read, by default all; id
+            is always read.
+        """
+        table = User.__table__
+        selected = table.select()
+        if columns is not None:
+            names = ["id"] + [name for name in columns if name != "id"]
+            selected = selected.with_only_columns(
+                *(table.c[name] for name in names))
+        last_id = 0
+        while True:
+            query = selected.where(table.c.id > last_id) \
+                .order_by(table.c.id).limit(batch_size)
+            with self._engine.connect() as conn:
+                result = conn.execute(query)
+                keys, rows = list(result.keys()), result.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(keys, row))
+            last_id = rows[-1].id
+
     def find_user_by(self, **kwargs: Dict) -> User:
         """
         Finds a user
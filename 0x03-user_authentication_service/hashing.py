@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Bounded bcrypt hashing service
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+import bcrypt
+
+
+class Overloaded(Exception):
+    """Raised when the hashing queue is full
+    """
+
+
+class HashingService:
+    """Runs bcrypt on a thread pool (bcrypt releases the GIL) and rejects
+    work once `max_queue` calls are waiting or running.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None) -> None:
+        """Initialize a new HashingService
+
+        Args:
+            workers (int): Number of hashing threads, by default
+            $HASH_WORKERS or the number of CPUs.
+            max_queue (int): Calls admitted at once, by default
+            $HASH_QUEUE_SIZE or 4 per worker.
+        """
+        self.workers = workers or int(
+            os.getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+        self.max_queue = max_queue or int(
+            os.getenv('HASH_QUEUE_SIZE', str(4 * self.workers)))
+        self._pool = ThreadPoolExecutor(self.workers,
+                                        thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._calls = 0
+        self._rejected = 0
+        self._queue_wait = 0.0
+        self._hash_time = 0.0
+
+    def _admit(self) -> None:
+        """Count a call in, or reject it.
+
+        Raises:
+            Overloaded: If max_queue calls are already admitted.
+        """
+        with self._lock:
+            if self._depth >= self.max_queue:
+                self._rejected += 1
+                raise Overloaded
+            self._depth += 1
+
+    def _release(self) -> None:
+        """Count a call out.
+        """
+        with self._lock:
+            self._depth -= 1
+
+    def _timed(self, func: Callable, *args) -> Callable:
+        """func(*args) as a callable recording its queue wait and run
+        time.
+        """
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._calls += 1
+                    self._queue_wait += started - submitted
+                    self._hash_time += finished - started
+        return timed
+
+    def _run(self, func: Callable, *args):
+        """Run func(*args) on the pool and wait for its result.
+
+        Raises:
+            Overloaded: If max_queue calls are already admitted.
+        """
+        self._admit()
+        try:
+            return self._pool.submit(self._timed(func, *args)).result()
+        finally:
+            self._release()
+
+    async def _run_async(self, func: Callable, *args):
+        """Run func(*args) on the pool and await its result, without
+        blocking the event loop.
+
+        Raises:
+            Overloaded: If max_queue calls are already admitted.
+        """
+        self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool,
+                                              self._timed(func, *args))
+        finally:
+            self._release()
+
+    def hashpw(self, password: bytes) -> bytes:
+        """Salted bcrypt hash of password.
+        """
+        return self._run(bcrypt.hashpw, password, bcrypt.gensalt())
+
+    def checkpw(self, password: bytes, hashed_password: bytes) -> bool:
+        """Check password against a bcrypt hash.
+        """
+        return self._run(bcrypt.checkpw, password, hashed_password)
+
+    async def hashpw_async(self, password: bytes) -> bytes:
+        """hashpw for coroutines.
+        """
+        return await self._run_async(bcrypt.hashpw, password,
+                                     bcrypt.gensalt())
+
+    async def checkpw_async(self, password: bytes,
+                            hashed_password: bytes) -> bool:
+        """checkpw for coroutines.
+        """
+        return await self._run_async(bcrypt.checkpw, password,
+                                     hashed_password)
+
+    def metrics(self) -> Dict[str, float]:
+        """Counters of the service, with average queue wait and hash time
+        in seconds.
+        """
+        with self._lock:
+            calls = self._calls or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "depth": self._depth,
+                "calls": self._calls,
+                "rejected": self._rejected,
+                "avg_queue_wait": self._queue_wait / calls,
+                "avg_hash_time": self._hash_time / calls,
+            }
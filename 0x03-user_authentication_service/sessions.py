@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""Session stores behind Auth
+
+The store is chosen with $SESSION_STORE:
+    db      the users.session_id column, one session per user (default)
+    memory  an in-process dict, lost on restart
+    file    the in-process dict, logged to $SESSION_FILE
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from sqlalchemy.orm.exc import NoResultFound
+
+from user import User
+
+
+class SessionStore(ABC):
+    """Session id -> user id mapping
+    """
+
+    @abstractmethod
+    def create(self, user_id: int, email: str = None) -> str:
+        """Start a session for user_id, of email, and return its id.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[int]:
+        """User id of a live session, None if it is unknown or expired.
+        """
+
+    @abstractmethod
+    def user(self, session_id: str) -> Optional[User]:
+        """User of a live session, None if it is unknown or expired.
+        """
+
+    @abstractmethod
+    def destroy(self, session_id: str) -> None:
+        """End a session.
+        """
+
+    @abstractmethod
+    def destroy_user(self, user_id: int) -> None:
+        """End every session of user_id.
+        """
+
+    def sweep(self) -> int:
+        """Drop expired sessions and return how many were dropped.
+        """
+        return 0
+
+
+class DBSessionStore(SessionStore):
+    """Sessions in the users.session_id column. A user has at most one
+    session, and sessions do not expire.
+    """
+
+    def __init__(self, db) -> None:
+        """Initialize a new DBSessionStore over a DB
+        """
+        self._db = db
+
+    def create(self, user_id: int, email: str = None) -> str:
+        """Start a session for user_id and return its id.
+        """
+        session_id = str(uuid.uuid4())
+        self._db.update_user(user_id, session_id=session_id)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[int]:
+        """User id of a session, None if it is unknown.
+        """
+        user = self.user(session_id)
+        return None if user is None else user.id
+
+    def user(self, session_id: str) -> Optional[User]:
+        """User of a session, None if it is unknown: a single query.
+        """
+        try:
+            return self._db.find_user_by(session_id=session_id)
+        except NoResultFound:
+            return None
+
+    def destroy(self, session_id: str) -> None:
+        """End a session.
+        """
+        user_id = self.get(session_id)
+        if user_id is not None:
+            self.destroy_user(user_id)
+
+    def destroy_user(self, user_id: int) -> None:
+        """End the session of user_id.
+        """
+        self._db.update_user(user_id, session_id=None)
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in an in-process dict: checking one costs no I/O. The
+    user id and email are kept with the session, so user() needs no query
+    either.
+
+    A session expires absolute_timeout seconds after it was created, or
+    idle_timeout seconds after it was last checked; 0 disables either
+    timeout. Beyond max_size sessions the least recently used one is
+    dropped. Expired sessions are dropped when checked, and by a
+    background thread every sweep_interval seconds.
+    """
+
+    def __init__(self, absolute_timeout: float = None,
+                 idle_timeout: float = None, max_size: int = None,
+                 sweep_interval: float = None) -> None:
+        """Initialize a new MemorySessionStore
+
+        Args:
+            absolute_timeout (float): By default $SESSION_MAX_AGE or
+            86400 seconds.
+            idle_timeout (float): By default $SESSION_IDLE_TIMEOUT or
+            1800 seconds.
+            max_size (int): By default $SESSION_MAX_COUNT or 100000.
+            sweep_interval (float): By default $SESSION_SWEEP_INTERVAL or
+            60 seconds, 0 for no background sweeps.
+        """
+        self.absolute_timeout = _setting(absolute_timeout,
+                                         'SESSION_MAX_AGE', 86400)
+        self.idle_timeout = _setting(idle_timeout,
+                                     'SESSION_IDLE_TIMEOUT', 1800)
+        self.max_size = int(_setting(max_size, 'SESSION_MAX_COUNT', 100000))
+        self.sweep_interval = _setting(sweep_interval,
+                                       'SESSION_SWEEP_INTERVAL', 60)
+        self._lock = threading.Lock()
+        # session id -> [user id, created at, last seen at, email],
+        # least recently used first
+        self._sessions = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        if self.sweep_interval:
+            sweeper = threading.Thread(target=self._sweeper, daemon=True,
+                                       name='session-sweeper')
+            sweeper.start()
+
+    def _expired(self, entry: list, now: float) -> bool:
+        """True if the session entry has timed out at now
+        """
+        created, last_seen = entry[1], entry[2]
+        return bool(
+            (self.absolute_timeout and now - created > self.absolute_timeout)
+            or (self.idle_timeout and now - last_seen > self.idle_timeout))
+
+    def _add(self, session_id: str, user_id: int, created: float,
+             last_seen: float, email: str = None) -> None:
+        """Store a session, evicting the least recently used ones beyond
+        max_size. The lock must be held.
+        """
+        self._sessions[session_id] = [user_id, created, last_seen, email]
+        self._by_user.setdefault(user_id, set()).add(session_id)
+        while len(self._sessions) > self.max_size:
+            self._remove(next(iter(self._sessions)))
+
+    def _remove(self, session_id: str) -> None:
+        """Drop a session. The lock must be held.
+        """
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return
+        sessions = self._by_user.get(entry[0])
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._by_user[entry[0]]
+
+    def create(self, user_id: int, email: str = None) -> str:
+        """Start a session for user_id, of email, and return its id.
+        """
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._add(session_id, user_id, now, now, email)
+        return session_id
+
+    def _entry(self, session_id: str) -> Optional[list]:
+        """Entry of a live session, marked as seen now, None if it is
+        unknown or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if self._expired(entry, now):
+                self._remove(session_id)
+                return None
+            entry[2] = now
+            self._sessions.move_to_end(session_id)
+            return entry
+
+    def get(self, session_id: str) -> Optional[int]:
+        """User id of a live session, None if it is unknown or expired.
+        """
+        entry = self._entry(session_id)
+        return None if entry is None else entry[0]
+
+    def user(self, session_id: str) -> Optional[User]:
+        """User of a live session, None if it is unknown or expired: a
+        transient User holding only the id and email of the session.
+        """
+        entry = self._entry(session_id)
+        if entry is None:
+            return None
+        return User(id=entry[0], email=entry[3])
+
+    def destroy(self, session_id: str) -> None:
+        """End a session.
+        """
+        with self._lock:
+            self._remove(session_id)
+
+    def destroy_user(self, user_id: int) -> None:
+        """End every session of user_id.
+        """
+        with self._lock:
+            for session_id in list(self._by_user.get(user_id, ())):
+                self._remove(session_id)
+
+    def sweep(self) -> int:
+        """Drop expired sessions and return how many were dropped.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [session_id
+                       for session_id, entry in self._sessions.items()
+                       if self._expired(entry, now)]
+            for session_id in expired:
+                self._remove(session_id)
+        return len(expired)
+
+    def _sweeper(self) -> None:
+        """Sweep every sweep_interval seconds
+        """
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logging.getLogger(__name__).exception("session sweep failed")
+
+    def __len__(self) -> int:
+        """Number of stored sessions, expired or not
+        """
+        return len(self._sessions)
+
+
+class FileSessionStore(MemorySessionStore):
+    """MemorySessionStore whose sessions survive restarts.
+
+    Sessions are checked in memory. Creating or ending one appends a line
+    to a JSON-lines log, which is replayed on startup and rewritten by
+    sweeps once mostly made of ended sessions. Lines are flushed but not
+    fsynced: a crash may lose the last sessions, which only logs their
+    users out. Idle timeouts start over on restart.
+    """
+
+    def __init__(self, file_path: str = None, **kwargs) -> None:
+        """Initialize a new FileSessionStore
+
+        Args:
+            file_path (str): Log file, by default $SESSION_FILE or
+            sessions.jsonl.
+            kwargs: As for MemorySessionStore.
+        """
+        self.file_path = file_path or os.getenv('SESSION_FILE',
+                                                'sessions.jsonl')
+        self._file = None
+        self._lines = 0
+        # records not yet appended to the log
+        self._log = []
+        super().__init__(**kwargs)
+        self._load()
+
+    def _load(self) -> None:
+        """Replay the log, and cut off a line torn by a crash so that new
+        records are not appended after it
+        """
+        if not os.path.exists(self.file_path):
+            return
+        now = time.time()
+        end = 0
+        with self._lock, open(self.file_path, 'r+b') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                end += len(line)
+                self._lines += 1
+                if record["op"] == "create":
+                    self._add(record["id"], record["user_id"],
+                              record["created"], now, record.get("email"))
+                else:
+                    self._remove(record["id"])
+            if f.seek(0, os.SEEK_END) > end:
+                f.truncate(end)
+            self._log = []
+
+    def _add(self, session_id: str, user_id: int, created: float,
+             last_seen: float, email: str = None) -> None:
+        """Store a session, logging it
+        """
+        self._log.append({"op": "create", "id": session_id,
+                          "user_id": user_id, "email": email,
+                          "created": created})
+        super()._add(session_id, user_id, created, last_seen, email)
+
+    def _remove(self, session_id: str) -> None:
+        """Drop a session, logging it
+        """
+        if session_id in self._sessions:
+            self._log.append({"op": "destroy", "id": session_id})
+        super()._remove(session_id)
+
+    def _flush(self) -> None:
+        """Append the pending records to the log
+        """
+        with self._lock:
+            if not self._log:
+                return
+            if self._file is None:
+                self._file = open(self.file_path, 'a')
+            self._file.write("".join(json.dumps(r) + "\n"
+                                     for r in self._log))
+            self._file.flush()
+            self._lines += len(self._log)
+            self._log = []
+
+    def create(self, user_id: int, email: str = None) -> str:
+        """Start a session for user_id, of email, and return its id.
+        """
+        session_id = super().create(user_id, email)
+        self._flush()
+        return session_id
+
+    def _entry(self, session_id: str) -> Optional[list]:
+        """Entry of a live session, logging it if it has expired
+        """
+        entry = super()._entry(session_id)
+        if entry is None:
+            self._flush()
+        return entry
+
+    def destroy(self, session_id: str) -> None:
+        """End a session.
+        """
+        super().destroy(session_id)
+        self._flush()
+
+    def destroy_user(self, user_id: int) -> None:
+        """End every session of user_id.
+        """
+        super().destroy_user(user_id)
+        self._flush()
+
+    def sweep(self) -> int:
+        """Drop expired sessions, and rewrite the log once it is mostly
+        made of ended sessions.
+        """
+        count = super().sweep()
+        self._flush()
+        with self._lock:
+            if self._lines > 2 * len(self._sessions) + 1000:
+                self._rewrite()
+        return count
+
+    def _rewrite(self) -> None:
+        """Replace the log by the live sessions. The lock must be held.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = "{}.tmp".format(self.file_path)
+        with open(tmp_path, 'w') as f:
+            for session_id, entry in self._sessions.items():
+                user_id, created, _, email = entry
+                f.write(json.dumps({"op": "create", "id": session_id,
+                                    "user_id": user_id, "email": email,
+                                    "created": created}) + "\n")
+        os.replace(tmp_path, self.file_path)
+        self._lines = len(self._sessions)
+
+
+def _setting(value, name: str, default: float) -> float:
+    """value, or the environment variable name, or default
+    """
+    if value is not None:
+        return value
+    return float(os.getenv(name, str(default)))
+
+
+def get_session_store(db, name: str = None) -> SessionStore:
+    """Session store called name, by default $SESSION_STORE (db)
+    """
+    name = name or os.getenv('SESSION_STORE', 'db')
+    if name == 'memory':
+        return MemorySessionStore()
+    if name == 'file':
+        return FileSessionStore()
+    if name == 'db':
+        return DBSessionStore(db)
+    raise ValueError("unknown session store {!r}, expected one of: db, "
+                     "file, memory".format(name))
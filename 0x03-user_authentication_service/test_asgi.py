@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Tests of the ASGI entry point
+"""
+import asyncio
+import importlib
+import json
+from typing import Dict, Tuple
+from urllib.parse import urlencode
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+PASSWORD = "H0lbertonSchool98!"
+
+
+@pytest.fixture(scope="module")
+def asgi():
+    """asgi module over an in-memory database
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("DB_URL", "sqlite://")
+        monkeypatch.setenv("SESSION_STORE", "db")
+        yield importlib.import_module("asgi")
+
+
+def request(asgi, method: str, path: str, form: Dict = None,
+            cookie: str = None) -> Tuple[int, Dict, Dict]:
+    """(status, headers, JSON body or None) of a request to asgi.app
+    """
+    body = urlencode(form or {}).encode()
+    headers = [(b"content-type", b"application/x-www-form-urlencoded")]
+    if cookie:
+        headers.append((b"cookie", cookie.encode()))
+    scope = {"type": "http", "method": method, "path": path,
+             "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start, content = sent[0], sent[1]["body"]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    data = json.loads(content) if content.startswith(b"{") else None
+    return start["status"], response_headers, data
+
+
+def test_register_login_profile_logout(asgi):
+    """The routes go through Auth, with the same answers as app.py
+    """
+    form = {"email": "asgi@hbtn.io", "password": PASSWORD}
+    assert request(asgi, "POST", "/users", form)[0] == 200
+    status, _, data = request(asgi, "POST", "/users", form)
+    assert (status, data) == (400, {"message": "email already registered"})
+
+    bad = {"email": "asgi@hbtn.io", "password": "wrong"}
+    assert request(asgi, "POST", "/sessions", bad)[0] == 401
+    status, headers, _ = request(asgi, "POST", "/sessions", form)
+    assert status == 200
+    cookie = headers["set-cookie"].split(";")[0]
+
+    status, _, data = request(asgi, "GET", "/profile", cookie=cookie)
+    assert (status, data) == (200, {"email": "asgi@hbtn.io"})
+    assert request(asgi, "DELETE", "/sessions", cookie=cookie)[0] == 302
+    assert request(asgi, "GET", "/profile", cookie=cookie)[0] == 403
+
+
+def test_update_password(asgi):
+    """A reset token sets a new password once
+    """
+    form = {"email": "reset@hbtn.io", "password": PASSWORD}
+    request(asgi, "POST", "/users", form)
+    _, _, data = request(asgi, "POST", "/reset_password",
+                         {"email": "reset@hbtn.io"})
+    update = {"email": "reset@hbtn.io", "reset_token": data["reset_token"],
+              "new_password": "n3w"}
+    assert request(asgi, "PUT", "/reset_password", update)[0] == 200
+    assert request(asgi, "PUT", "/reset_password", update)[0] == 403
+    login = {"email": "reset@hbtn.io", "password": "n3w"}
+    assert request(asgi, "POST", "/sessions", login)[0] == 200
+
+
+def test_other_integrity_errors_are_not_duplicates(asgi):
+    """Only a taken email is answered as already registered
+    """
+    with pytest.raises(IntegrityError):
+        request(asgi, "POST", "/users", {"email": "nopassword@hbtn.io"})
+    asgi.AUTH._add_user("raced@hbtn.io", b"hashed")
+    with pytest.raises(ValueError):
+        asgi.AUTH._add_user("raced@hbtn.io", b"hashed")
+
+
+def test_overloaded(asgi, monkeypatch):
+    """A login rejected by the hashing service is answered 503
+    """
+    form = {"email": "busy@hbtn.io", "password": PASSWORD}
+    assert request(asgi, "POST", "/users", form)[0] == 200
+    monkeypatch.setattr(asgi.HASHING, "max_queue", 0)
+    status, headers, data = request(asgi, "POST", "/sessions", form)
+    assert (status, data) == (503, {"message": "service overloaded"})
+    assert headers["retry-after"] == "1"
+    monkeypatch.undo()
+    assert request(asgi, "POST", "/sessions", form)[0] == 200
+    assert asgi.HASHING.metrics()["depth"] == 0
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests of the DB schema setup
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from db import DB, SCHEMA_VERSION
+
+# users as created before the schema was versioned or indexed
+VERSION_0 = """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    email VARCHAR(250) NOT NULL,
+    hashed_password VARCHAR(250) NOT NULL,
+    session_id VARCHAR(250),
+    reset_token VARCHAR(250),
+    PRIMARY KEY (id)
+)
+"""
+
+
+@pytest.fixture
+def version_0(tmp_path):
+    """Path of a version 0 database file with three users
+    """
+    file_path = str(tmp_path / "a.db")
+    conn = sqlite3.connect(file_path)
+    conn.execute(VERSION_0)
+    conn.executemany(
+        "INSERT INTO users (email, hashed_password, session_id) "
+        "VALUES (?, ?, ?)",
+        [("bob@hbtn.io", "h1", "s1"), ("amy@hbtn.io", "h2", None),
+         ("joe@hbtn.io", "h3", None)])
+    conn.commit()
+    conn.close()
+    return file_path
+
+
+def rows(file_path: str) -> list:
+    """(email, hashed_password, session_id) of every user, in id order
+    """
+    conn = sqlite3.connect(file_path)
+    try:
+        return conn.execute("SELECT email, hashed_password, session_id "
+                            "FROM users ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def table_names(file_path: str) -> list:
+    """Names of the tables and indexes in the database file
+    """
+    conn = sqlite3.connect(file_path)
+    try:
+        return sorted(name for name, in conn.execute(
+            "SELECT name FROM sqlite_master"))
+    finally:
+        conn.close()
+
+
+def test_upgrade_keeps_rows(version_0):
+    """Upgrading a version 0 database keeps its users and adds the
+    unique email index
+    """
+    before = rows(version_0)
+    db = DB("sqlite:///" + version_0)
+    assert db.get_schema_version() == SCHEMA_VERSION
+    assert rows(version_0) == before
+
+    indexes = {index["name"]: index
+               for index in inspect(db._engine).get_indexes("users")}
+    assert indexes["ix_users_email"]["unique"]
+    assert "ix_users_session_id" in indexes
+    assert db.find_user_by(session_id="s1").email == "bob@hbtn.io"
+    with pytest.raises(IntegrityError):
+        db.add_user("bob@hbtn.io", "h4")
+
+
+def test_restart_keeps_rows(version_0):
+    """A second start on an upgraded database changes nothing
+    """
+    DB("sqlite:///" + version_0)
+    db = DB("sqlite:///" + version_0)
+    db.add_user("new@hbtn.io", "h4")
+    assert len(rows(version_0)) == 4
+    DB("sqlite:///" + version_0)
+    assert len(rows(version_0)) == 4
+
+
+def test_upgrade_with_duplicates(version_0):
+    """Duplicate emails stop the upgrade before any change, and it goes
+    through once they are resolved
+    """
+    conn = sqlite3.connect(version_0)
+    conn.execute("INSERT INTO users (email, hashed_password) "
+                 "VALUES ('bob@hbtn.io', 'h4')")
+    conn.commit()
+    conn.close()
+    before, names = rows(version_0), table_names(version_0)
+
+    with pytest.raises(ValueError, match="ix_users_email.*bob@hbtn.io"):
+        DB("sqlite:///" + version_0)
+    assert rows(version_0) == before
+    assert table_names(version_0) == names
+
+    conn = sqlite3.connect(version_0)
+    conn.execute("DELETE FROM users WHERE hashed_password = 'h4'")
+    conn.commit()
+    conn.close()
+    db = DB("sqlite:///" + version_0)
+    assert db.get_schema_version() == SCHEMA_VERSION
+    assert db.find_duplicates() == {}
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Tests of the bounded hashing service
+"""
+import asyncio
+import importlib
+import threading
+
+import pytest
+
+from hashing import HashingService, Overloaded
+
+PASSWORD = "H0lbertonSchool98!"
+
+
+@pytest.fixture(scope="module")
+def app():
+    """app module over an in-memory database
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("DB_URL", "sqlite://")
+        yield importlib.import_module("app")
+
+
+def test_overloaded():
+    """Calls beyond max_queue are rejected at once, and admitted again
+    once the running ones are done
+    """
+    service = HashingService(workers=1, max_queue=1)
+    started, done = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        done.wait(5)
+
+    thread = threading.Thread(target=service._run, args=(slow,))
+    thread.start()
+    assert started.wait(5)
+    with pytest.raises(Overloaded):
+        service.hashpw(b"pwd")
+    with pytest.raises(Overloaded):
+        asyncio.run(service.checkpw_async(b"pwd", b"hashed"))
+    done.set()
+    thread.join(5)
+
+    metrics = service.metrics()
+    assert (metrics["depth"], metrics["rejected"]) == (0, 2)
+    assert service.checkpw(b"pwd", service.hashpw(b"pwd"))
+
+
+def test_depth_after_errors():
+    """Failing calls are counted out too
+    """
+    service = HashingService(workers=1, max_queue=1)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            service.checkpw(b"pwd", b"not a bcrypt hash")
+        with pytest.raises(ValueError):
+            asyncio.run(service.checkpw_async(b"pwd", b"not a bcrypt hash"))
+    assert service.metrics()["depth"] == 0
+    assert service.metrics()["rejected"] == 0
+
+
+def test_app_overloaded(app, monkeypatch):
+    """A login rejected by the hashing service is answered 503
+    """
+    form = {"email": "busy@hbtn.io", "password": PASSWORD}
+    client = app.app.test_client()
+    assert client.post("/users", data=form).status_code == 200
+
+    monkeypatch.setattr(app.HASHING, "max_queue", 0)
+    response = client.post("/sessions", data=form)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.get_json() == {"message": "service overloaded"}
+
+    monkeypatch.undo()
+    assert client.post("/sessions", data=form).status_code == 200
+    assert app.HASHING.metrics()["depth"] == 0
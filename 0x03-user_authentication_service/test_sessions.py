@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Tests of the session stores
+"""
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+import sessions
+from auth import Auth
+from sessions import (DBSessionStore, FileSessionStore, MemorySessionStore,
+                      get_session_store)
+
+
+class Clock:
+    """Stands for the time module in sessions
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new Clock at 1000 seconds
+        """
+        self.now = 1000.0
+
+    def time(self) -> float:
+        """Current time
+        """
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep in real time, for the sweepers still running
+        """
+        time.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Time of the session stores, moved by hand
+    """
+    clock = Clock()
+    monkeypatch.setattr(sessions, "time", clock)
+    return clock
+
+
+def memory_store(**kwargs) -> MemorySessionStore:
+    """MemorySessionStore without a sweeper thread
+    """
+    settings = dict(absolute_timeout=100, idle_timeout=10, max_size=1000,
+                    sweep_interval=0)
+    settings.update(kwargs)
+    return MemorySessionStore(**settings)
+
+
+def test_absolute_timeout(clock):
+    """A session used all along still expires absolute_timeout after
+    its creation
+    """
+    store = memory_store()
+    session_id = store.create(1, "bob@hbtn.io")
+    for _ in range(10):
+        clock.now += 9
+        assert store.get(session_id) == 1
+    clock.now += 11
+    assert store.get(session_id) is None
+    assert len(store) == 0
+
+
+def test_idle_timeout(clock):
+    """A session expires idle_timeout after it was last checked
+    """
+    store = memory_store()
+    session_id = store.create(1)
+    clock.now += 10
+    assert store.get(session_id) == 1
+    clock.now += 10.5
+    assert store.get(session_id) is None
+
+
+def test_sweep(clock):
+    """sweep() drops the expired sessions only
+    """
+    store = memory_store()
+    old = store.create(1)
+    clock.now += 5
+    new = store.create(2)
+    clock.now += 6
+    assert store.sweep() == 1
+    assert store.get(old) is None
+    assert store.get(new) == 2
+
+
+def test_max_size_evicts_least_recently_used(clock):
+    """Beyond max_size the least recently checked session is dropped
+    """
+    store = memory_store(max_size=2)
+    first, second = store.create(1), store.create(2)
+    store.get(first)
+    third = store.create(3)
+    assert store.get(second) is None
+    assert store.get(first) == 1
+    assert store.get(third) == 3
+
+
+def test_user_without_query(clock):
+    """user() gives the id and email kept in the session
+    """
+    store = memory_store()
+    user = store.user(store.create(7, "bob@hbtn.io"))
+    assert (user.id, user.email) == (7, "bob@hbtn.io")
+    assert store.user("unknown") is None
+
+
+def test_destroy(clock):
+    """destroy() ends one session, destroy_user() all of a user's
+    """
+    store = memory_store()
+    sessions_1 = [store.create(1), store.create(1)]
+    other = store.create(2)
+    store.destroy(sessions_1[0])
+    assert store.get(sessions_1[0]) is None
+    assert store.get(sessions_1[1]) == 1
+    store.destroy_user(1)
+    assert store.get(sessions_1[1]) is None
+    assert store.get(other) == 2
+
+
+def test_sweeper_survives_errors(monkeypatch):
+    """A failing sweep is logged and the next ones still run
+    """
+    swept = threading.Event()
+    calls = []
+
+    def sweep(self):
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("sweep failed")
+        swept.set()
+        return 0
+
+    monkeypatch.setattr(MemorySessionStore, "sweep", sweep)
+    memory_store(sweep_interval=0.01)
+    assert swept.wait(5)
+
+
+def test_file_store_replay(clock, tmp_path):
+    """Sessions and their ends survive a restart
+    """
+    file_path = str(tmp_path / "sessions.jsonl")
+    store = FileSessionStore(file_path, absolute_timeout=100,
+                             idle_timeout=10, sweep_interval=0)
+    kept = store.create(1, "bob@hbtn.io")
+    ended = store.create(2)
+    store.destroy(ended)
+
+    restarted = FileSessionStore(file_path, absolute_timeout=100,
+                                 idle_timeout=10, sweep_interval=0)
+    assert restarted.user(kept).email == "bob@hbtn.io"
+    assert restarted.get(ended) is None
+    clock.now += 101
+    assert restarted.get(kept) is None
+
+
+def test_file_store_torn_line(clock, tmp_path):
+    """Sessions created after a crash tore the last line survive the
+    next restart
+    """
+    file_path = tmp_path / "sessions.jsonl"
+    store = FileSessionStore(str(file_path), sweep_interval=0)
+    before = store.create(1)
+    with open(str(file_path), "a") as f:
+        f.write('{"op": "create", "id": "torn"')
+
+    restarted = FileSessionStore(str(file_path), sweep_interval=0)
+    after = restarted.create(2)
+    again = FileSessionStore(str(file_path), sweep_interval=0)
+    assert again.get(before) == 1
+    assert again.get(after) == 2
+
+
+def test_file_store_rewrite(clock, tmp_path):
+    """A sweep rewrites a log mostly made of ended sessions to the live
+    ones
+    """
+    file_path = tmp_path / "sessions.jsonl"
+    store = FileSessionStore(str(file_path), absolute_timeout=100,
+                             idle_timeout=0, sweep_interval=0)
+    for i in range(600):
+        store.destroy(store.create(i))
+    live = store.create(600, "bob@hbtn.io")
+    assert len(file_path.read_text().splitlines()) == 1201
+
+    store.sweep()
+    records = [json.loads(line)
+               for line in file_path.read_text().splitlines()]
+    assert records == [{"op": "create", "id": live, "user_id": 600,
+                        "email": "bob@hbtn.io", "created": clock.now}]
+    restarted = FileSessionStore(str(file_path), sweep_interval=0)
+    assert restarted.get(live) == 600
+
+
+def test_get_session_store(tmp_path, monkeypatch):
+    """Stores are chosen by name, unknown names are refused
+    """
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_FILE", str(tmp_path / "sessions.jsonl"))
+    assert isinstance(get_session_store(None, "memory"), MemorySessionStore)
+    assert isinstance(get_session_store(None, "file"), FileSessionStore)
+    assert isinstance(get_session_store(None, "db"), DBSessionStore)
+    with pytest.raises(ValueError, match="'redis'.*db, file, memory"):
+        get_session_store(None, "redis")
+
+
+@pytest.mark.parametrize("name", ["db", "memory"])
+def test_auth_sessions(name, monkeypatch):
+    """Checking a session costs one query with the DB store, none with
+    the memory store; logging out ends only that session
+    """
+    monkeypatch.setenv("DB_URL", "sqlite://")
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_STORE", name)
+    auth = Auth()
+    user = auth._db.add_user("bob@hbtn.io", b"hashed")
+    first = auth.create_session("bob@hbtn.io")
+    second = auth.create_session("bob@hbtn.io")
+
+    queries = []
+    event.listen(auth._db._engine, "before_cursor_execute",
+                 lambda *args: queries.append(args[2]))
+    assert auth.get_user_from_session_id(second).email == "bob@hbtn.io"
+    assert len(queries) == (1 if name == "db" else 0)
+
+    if name == "memory":
+        auth.destroy_session(user.id, first)
+        assert auth.get_user_from_session_id(first) is None
+        assert auth.get_user_from_session_id(second) is not None
+    auth.destroy_session(user.id, second)
+    assert auth.get_user_from_session_id(second) is None
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Tests of bulk user import and export
+"""
+import csv
+import io
+import json
+
+import bcrypt
+import pytest
+
+from db import DB
+from users_bulk import export_users, import_users
+
+HASHED = bcrypt.hashpw(b"H0lberton", bcrypt.gensalt(4))
+
+
+@pytest.fixture
+def db():
+    """DB over an empty in-memory database
+    """
+    return DB("sqlite://", reset=True)
+
+
+def users(count: int, start: int = 0) -> list:
+    """count rows with distinct emails and a hashed password, as the
+    import hands them to add_users_bulk
+    """
+    return [{"email": "user{}@hbtn.io".format(i), "hashed_password": HASHED}
+            for i in range(start, start + count)]
+
+
+def test_add_users_bulk_duplicates(db):
+    """Taken emails are skipped, within a batch and across batches
+    """
+    assert db.add_users_bulk(users(5), batch_size=2) == (5, 0)
+    rows = users(3, start=4) + users(1, start=7) + users(2)
+    assert db.add_users_bulk(iter(rows), batch_size=2) == (3, 3)
+    emails = [user["email"] for user in db.iter_users(columns=["email"])]
+    assert emails == ["user{}@hbtn.io".format(i) for i in range(8)]
+
+
+def test_iter_users(db):
+    """Users come in id order across batches, with the columns asked
+    for and the id
+    """
+    db.add_users_bulk(users(5))
+    rows = list(db.iter_users(batch_size=2, columns=["email"]))
+    assert [sorted(row) for row in rows] == [["email", "id"]] * 5
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert list(db.iter_users(batch_size=10))[0]["session_id"] is None
+
+
+@pytest.mark.parametrize("json_lines", [False, True], ids=["csv", "jsonl"])
+def test_round_trip(db, json_lines):
+    """Exported users import into another database as they were, without
+    their sessions
+    """
+    db.add_users_bulk(users(3))
+    db.update_user(1, session_id="secret", reset_token="secret")
+    exported = io.StringIO()
+    assert export_users(db, exported, json_lines) == {"written": 3}
+    assert "secret" not in exported.getvalue()
+
+    other = DB("sqlite://", reset=True)
+    exported.seek(0)
+    counts = import_users(other, exported, json_lines, batch_size=2)
+    assert counts == {"read": 3, "inserted": 3, "skipped": 0, "invalid": 0}
+    assert list(other.iter_users(columns=["email", "hashed_password"])) == \
+        list(db.iter_users(columns=["email", "hashed_password"]))
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_bad_rows(db, workers):
+    """Rows without an email or a password are counted and skipped, the
+    others imported
+    """
+    rows = [
+        {"email": "a@hbtn.io", "password": "H0lberton"},
+        {"email": "b@hbtn.io", "password": ""},
+        {"email": "c@hbtn.io"},
+        {"email": "", "hashed_password": HASHED.decode()},
+        {"password": "H0lberton"},
+        ["d@hbtn.io", "H0lberton"],
+        {"email": "e@hbtn.io", "hashed_password": HASHED.decode()},
+        {"email": "a@hbtn.io", "hashed_password": HASHED.decode()},
+    ]
+    lines = [json.dumps(row) for row in rows] + ['{"email": "torn']
+    f = io.StringIO("\n".join(lines) + "\n")
+    counts = import_users(db, f, True, workers)
+    assert counts == {"read": 9, "inserted": 2, "skipped": 1, "invalid": 6}
+
+    user = db.find_user_by(email="a@hbtn.io")
+    assert bcrypt.checkpw(b"H0lberton", user.hashed_password)
+    assert db.find_user_by(email="e@hbtn.io").hashed_password == HASHED
+
+
+def test_import_csv_missing_column(db):
+    """CSV rows short of a password are invalid
+    """
+    f = io.StringIO()
+    writer = csv.writer(f)
+    writer.writerows([["email", "password"], ["a@hbtn.io", "H0lberton"],
+                      ["b@hbtn.io"], ["c@hbtn.io", ""]])
+    f.seek(0)
+    counts = import_users(db, f, False)
+    assert counts == {"read": 3, "inserted": 1, "skipped": 0, "invalid": 2}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export of users
+
+    ./users_bulk.py import [-w 8] users.csv
+    ./users_bulk.py export users.jsonl
+
+Files are CSV with a header line, or JSON lines if they end in .jsonl
+or .json; "-" means stdin/stdout. Imported rows hold an email and
+either a password, hashed with bcrypt by a process pool, or a
+hashed_password kept as is; other columns, such as a session_id or
+reset_token, are ignored. Users whose email is taken are skipped, rows
+without an email or a non-empty password are counted as invalid.
+Both ways the users are streamed in batches, and rows/sec is reported
+on stderr.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+import bcrypt
+
+from db import BATCH_SIZE, DB
+
+
+HASH_BATCH_SIZE = 64
+# session_id and reset_token are live credentials: never exported
+FIELDS = ("id", "email", "hashed_password")
+
+
+def is_json_lines(file_path: str) -> bool:
+    """ True if file_path is read/written as JSON lines """
+    return file_path.endswith((".jsonl", ".json"))
+
+
+def read_users(f: TextIO, json_lines: bool) -> Iterator[Dict]:
+    """ yields the rows of a CSV or JSON lines file, None for a line
+    which isn't JSON """
+    if not json_lines:
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def is_valid_user(user: Dict) -> bool:
+    """ True if user holds an email and a non-empty password or
+    hashed_password """
+    if not isinstance(user, dict):
+        return False
+    email = user.get("email")
+    if not isinstance(email, str) or "@" not in email:
+        return False
+    return any(isinstance(user.get(key), str) and user[key]
+               for key in ("hashed_password", "password"))
+
+
+def hash_users(users: List[Dict]) -> List[Dict]:
+    """ returns the users with their passwords hashed, None in place of
+    the invalid ones (see is_valid_user) """
+    hashed = []
+    for user in users:
+        if not is_valid_user(user):
+            hashed.append(None)
+            continue
+        hashed_password = user.get("hashed_password")
+        if hashed_password:
+            hashed_password = hashed_password.encode("utf-8")
+        else:
+            hashed_password = bcrypt.hashpw(
+                user["password"].encode("utf-8"), bcrypt.gensalt())
+        hashed.append({"email": user["email"],
+                       "hashed_password": hashed_password})
+    return hashed
+
+
+def hash_stream(users: Iterable[Dict], workers: int = 0) -> Iterator[Dict]:
+    """ yields the users hashed by hash_users, in order, in workers
+    processes if workers is 2 or more """
+    users = iter(users)
+    batches = iter(lambda: list(islice(users, HASH_BATCH_SIZE)), [])
+    if workers < 2:
+        for batch in batches:
+            yield from hash_users(batch)
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for batch in batches:
+            pending.append(executor.submit(hash_users, batch))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def import_users(db: DB, f: TextIO, json_lines: bool, workers: int = 0,
+                 batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """ imports the users of f and returns the number of rows read,
+    inserted, skipped as duplicates and invalid """
+    read = invalid = 0
+
+    def counted():
+        nonlocal read, invalid
+        for user in hash_stream(read_users(f, json_lines), workers):
+            read += 1
+            if user is None:
+                invalid += 1
+            else:
+                yield user
+
+    inserted, skipped = db.add_users_bulk(counted(), batch_size)
+    return {"read": read, "inserted": inserted, "skipped": skipped,
+            "invalid": invalid}
+
+
+def export_users(db: DB, f: TextIO, json_lines: bool,
+                 batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """ writes every user to f and returns the number of rows written """
+    written = 0
+    writer = None if json_lines else csv.DictWriter(f, FIELDS)
+    if writer is not None:
+        writer.writeheader()
+    for user in db.iter_users(batch_size, FIELDS):
+        if isinstance(user["hashed_password"], bytes):
+            user["hashed_password"] = user["hashed_password"].decode("utf-8")
+        if writer is not None:
+            writer.writerow(user)
+        else:
+            f.write(json.dumps(user) + "\n")
+        written += 1
+    return {"written": written}
+
+
+def main() -> None:
+    """ command line entry point """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="users file, - for stdin/stdout")
+    parser.add_argument("-j", "--json-lines", action="store_true",
+                        help="read/write JSON lines whatever the name")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows per transaction or query")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="hash passwords in this many processes")
+    args = parser.parse_args()
+
+    json_lines = args.json_lines or is_json_lines(args.file)
+    db = DB()
+    start = time.perf_counter()
+    if args.command == "import":
+        f = sys.stdin if args.file == "-" else \
+            open(args.file, "r", newline="", encoding="utf-8")
+    else:
+        f = sys.stdout if args.file == "-" else \
+            open(args.file, "w", newline="", encoding="utf-8")
+    try:
+        if args.command == "import":
+            counts = import_users(db, f, json_lines, args.workers,
+                                  args.batch_size)
+        else:
+            counts = export_users(db, f, json_lines, args.batch_size)
+    finally:
+        if f not in (sys.stdin, sys.stdout):
+            f.close()
+    elapsed = time.perf_counter() - start
+    rows = counts.get("read", counts.get("written"))
+    print("{} in {:.2f}s ({:.0f} rows/s)".format(
+        ", ".join("{} {}".format(v, k) for k, v in counts.items()),
+        elapsed, rows / (elapsed or 1)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()